@@ -1,10 +1,25 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Like, Group, Post
+from . import search
+from .models import Comment, Follow, Like, Group, Post, Profile
 
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author')
+class FullTextSearchMixin:
+    """Ищет по тексту через поисковый индекс posts.search вместо
+    LIKE '%…%' по всей таблице.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term.strip():
+            found = search.filter_queryset(queryset, search_term)
+            if found is not None:
+                return found, False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author',
+                    'likes_count', 'comments_count')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
@@ -15,7 +30,7 @@ class GroupAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title',)}
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'post', 'created', 'author')
     search_fields = ('text',)
     list_filter = ('created',)
@@ -31,8 +46,16 @@ class LikeAdmin(admin.ModelAdmin):
     search_fields = ('user', 'post')
 
 
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'posts_count', 'followers_count',
+                    'following_count')
+    readonly_fields = ('posts_count', 'followers_count', 'following_count')
+    search_fields = ('user__username',)
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
 admin.site.register(Like, LikeAdmin)
+admin.site.register(Profile, ProfileAdmin)
@@ -0,0 +1,90 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+FEED_VERSION_KEY = 'posts:feed_version'
+
+
+def get_feed_version():
+    """Текущая версия лент. Входит в ключи кэша всего, что зависит
+    от набора постов и подписок, поэтому смена версии делает такие
+    записи недоступными без их перебора.
+    """
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        # После вытеснения ключа версия не должна повторить старую
+        cache.add(FEED_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    """Сбрасывает всё, что закэшировано для текущей версии лент."""
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        get_feed_version()
+
+
+def invalidate_feeds():
+    """Сбрасывает кэш лент сразу и ещё раз после фиксации транзакции:
+    иначе параллельный запрос мог бы успеть закэшировать старые данные
+    под новой версией.
+    """
+    bump_feed_version()
+    transaction.on_commit(bump_feed_version)
+
+
+def post_card_key(post_id):
+    """Ключ кэша общей для всех пользователей части карточки поста.
+    POST_CARD_VERSION меняют вместе с шаблоном карточки.
+    """
+    return f'post_card:{settings.POST_CARD_VERSION}:{post_id}'
+
+
+def invalidate_post_cards(post_ids):
+    """Удаляет из кэша карточки постов сразу и после фиксации
+    транзакции (см. invalidate_feeds).
+    """
+    keys = [post_card_key(post_id) for post_id in post_ids]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+PAGE_CACHE_OUTCOMES = ('hit', 'stale', 'miss')
+
+
+def page_cache_key(request):
+    path = request.get_full_path().encode()
+    return f'page_cache:{hashlib.md5(path).hexdigest()}'
+
+
+def record_page_cache(outcome):
+    """Увеличивает счётчик outcome. Обычно это один incr, то есть одна
+    запись в общий кэш; add нужен только для первого ответа и после
+    вытеснения счётчика.
+    """
+    key = f'page_cache:stats:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            # Счётчик только что создал другой запрос
+            cache.incr(key)
+
+
+def page_cache_stats():
+    """Счётчики попаданий, устаревших ответов и промахов кэша страниц."""
+    keys = {f'page_cache:stats:{outcome}': outcome
+            for outcome in PAGE_CACHE_OUTCOMES}
+    values = cache.get_many(list(keys))
+    return {outcome: values.get(key, 0) for key, outcome in keys.items()}
+
+
+def reset_page_cache_stats():
+    cache.delete_many(
+        [f'page_cache:stats:{outcome}' for outcome in PAGE_CACHE_OUTCOMES])
@@ -0,0 +1,86 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, ImageBlob, Like, Post, Profile, User
+
+# Модель со счётчиками -> (поле для связи с подсчитываемыми объектами,
+# {счётчик: (подсчитываемая модель, поле связи в ней)})
+COUNTERS = {
+    Post: ('pk', {
+        'likes_count': (Like, 'post'),
+        'comments_count': (Comment, 'post'),
+    }),
+    Profile: ('user_id', {
+        'posts_count': (Post, 'author'),
+        'followers_count': (Follow, 'author'),
+        'following_count': (Follow, 'user'),
+    }),
+    ImageBlob: ('name', {
+        'references': (Post, 'image'),
+    }),
+}
+
+
+def count_related(model, field, outer_ref):
+    """Подзапрос, считающий объекты model, связанные через field
+    с внешним объектом.
+    """
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer_ref)})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def create_missing_profiles():
+    """Создаёт профили пользователям, у которых их нет.
+    Возвращает количество созданных профилей.
+    """
+    profiles = [
+        Profile(user_id=user_id)
+        for user_id in User.objects.filter(profile__isnull=True)
+        .values_list('pk', flat=True).iterator()
+    ]
+    Profile.objects.bulk_create(profiles, batch_size=1000)
+    return len(profiles)
+
+
+def find_mismatches(model):
+    """Возвращает QuerySet объектов model, у которых сохранённые
+    счётчики расходятся с фактическими, с аннотациями actual_<счётчик>.
+    """
+    outer_ref, counters = COUNTERS[model]
+    annotations = {
+        f'actual_{field}': count_related(related, related_field, outer_ref)
+        for field, (related, related_field) in counters.items()
+    }
+    condition = Q()
+    for field in counters:
+        condition |= ~Q(**{field: F(f'actual_{field}')})
+    return model.objects.annotate(**annotations).filter(condition)
+
+
+def rebuild_counters(model, batch_size=1000, dry_run=False):
+    """Пересчитывает счётчики model пачками по batch_size объектов.
+    Возвращает количество объектов с расходящимися счётчиками.
+    """
+    _, counters = COUNTERS[model]
+    fields = list(counters)
+    rows = find_mismatches(model).order_by('pk').values_list(
+        'pk', *(f'actual_{field}' for field in fields))
+
+    found = 0
+    last_pk = None
+    while True:
+        page = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        batch = list(page[:batch_size])
+        if not batch:
+            return found
+        if not dry_run:
+            model.objects.bulk_update(
+                [model(pk=pk, **dict(zip(fields, values)))
+                 for pk, *values in batch],
+                fields,
+            )
+        found += len(batch)
+        last_pk = batch[-1][0]
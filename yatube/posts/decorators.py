@@ -1,17 +1,129 @@
+import time
 from functools import wraps
 
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
+from .cache import get_feed_version, page_cache_key, record_page_cache
 from .models import Post
+from .uploads import ImageUploadHandler
 
 
-def is_post_author(func):
-    """Проверяет, является ли текущий пользователь автором поста."""
+def author_required(queryset, name='post', redirect_to='post'):
+    """Декоратор для представлений, доступных только автору объекта.
+
+    Объект ищется в queryset одним запросом по первичному ключу
+    из аргумента <name>_id и имени автора из username; автор
+    сравнивается по author_id, без загрузки пользователя. Найденный
+    объект передаётся представлению аргументом name. Не автора
+    перенаправляет на redirect_to с теми же аргументами URL.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            obj = get_object_or_404(queryset, pk=kwargs[f'{name}_id'],
+                                    author__username=kwargs['username'])
+            if obj.author_id != request.user.pk:
+                return redirect(reverse(redirect_to, args=args,
+                                        kwargs=kwargs))
+            return func(request, *args, **{name: obj}, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Проверяет, является ли текущий пользователь автором поста
+is_post_author = author_required(Post.objects.all())
+
+
+def image_uploads(func):
+    """Принимает файлы запроса через posts.uploads.ImageUploadHandler.
+
+    Обработчики загрузки можно заменить только до первого чтения
+    request.POST, а CsrfViewMiddleware читает его ещё до представления,
+    поэтому CSRF проверяется уже после замены (csrf_protect).
+    """
+    protected = csrf_protect(func)
+
+    @csrf_exempt
+    @wraps(func)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return wrapper
+
+
+def cache_anonymous_page(func):
+    """Кэширует страницу целиком для анонимных посетителей.
+
+    Запись в кэше помечена версией лент и сроком свежести. Устаревшую
+    запись (срок вышел или появились новые посты) пересобирает только
+    тот запрос, который захватил блокировку, остальные в это время
+    получают устаревшую страницу. Если записи нет совсем, остальные
+    запросы ждут результат до PAGE_CACHE_LOCK_WAIT секунд.
+    Результат отдаётся в заголовке X-Cache.
+    """
     @wraps(func)
-    def wrapper(request, username, post_id, *args, **kwargs):
-        post = get_object_or_404(Post, id=post_id)
-        if request.user == post.author:
-            return func(request, username, post_id, *args, **kwargs)
-        return redirect(reverse_lazy('post', args=(username, post_id)))
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            return func(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        lock_key = f'{key}:lock'
+        version = get_feed_version()
+        entry = cache.get(key)
+        if entry is not None:
+            entry_version, fresh_until, content_type, content = entry
+            if entry_version == version and time.time() < fresh_until:
+                return cached_response(content, content_type, 'hit')
+            if not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+                return cached_response(content, content_type, 'stale')
+        elif not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            entry = wait_for_entry(key)
+            if entry is not None:
+                _, _, content_type, content = entry
+                return cached_response(content, content_type, 'hit')
+            return uncached_response(func(request, *args, **kwargs))
+
+        try:
+            response = func(request, *args, **kwargs)
+            if (response.status_code == 200 and not response.streaming
+                    and not response.cookies):
+                cache.set(
+                    key,
+                    (version, time.time() + settings.PAGE_CACHE_TIMEOUT,
+                     response['Content-Type'], response.content),
+                    settings.PAGE_CACHE_STALE_TIMEOUT,
+                )
+        finally:
+            cache.delete(lock_key)
+        return uncached_response(response)
     return wrapper
+
+
+def cached_response(content, content_type, outcome):
+    record_page_cache(outcome)
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Cache'] = outcome.upper()
+    return response
+
+
+def uncached_response(response):
+    record_page_cache('miss')
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def wait_for_entry(key):
+    """Ждёт, пока другой запрос положит страницу в кэш."""
+    deadline = time.time() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
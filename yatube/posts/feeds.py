@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.db.models import Max
+
+from .models import FeedEntry, Follow, Post, Profile
+
+BATCH_SIZE = 1000
+
+# Ключи сортировки ленты подписок для курсорной пагинации
+FOLLOW_FEED_KEYS = ('-pub_date', '-post_id')
+
+
+def is_celebrity(author_id):
+    """Слишком ли много у автора подписчиков для раскладки поста
+    по их лентам при публикации.
+    """
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def fan_out(post):
+    """Добавляет пост в ленты подписчиков автора (fan-out on write).
+    Посты популярных авторов не раскладываются: читатели подтягивают
+    их сами в pull_celebrities.
+    """
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(FeedEntry(user_id=user_id, post_id=post.pk,
+                               author_id=post.author_id,
+                               pub_date=post.pub_date))
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def update_post(post):
+    """Приводит записи лент в соответствие с отредактированным постом."""
+    if post.loaded_value('author_id') not in (None, post.author_id):
+        FeedEntry.objects.filter(post=post).delete()
+        fan_out(post)
+    elif post.loaded_value('pub_date') not in (None, post.pub_date):
+        FeedEntry.objects.filter(post=post).update(pub_date=post.pub_date)
+
+
+def backfill(user_id, author_id, since=None):
+    """Добавляет в ленту пользователя последние FEED_BACKFILL постов
+    автора, опубликованных позже since.
+    """
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gt=since)
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=post_id, author_id=author_id,
+                   pub_date=pub_date)
+         for post_id, pub_date in posts.order_by('-pub_date', '-id')
+         .values_list('id', 'pub_date')[:settings.FEED_BACKFILL]],
+        ignore_conflicts=True,
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def pull_celebrities(user):
+    """Подтягивает в ленту пользователя новые посты авторов, для которых
+    раскладка при записи не делается.
+    """
+    celebrities = list(Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+    if not celebrities:
+        return
+    latest = dict(
+        FeedEntry.objects.filter(user=user, author_id__in=celebrities)
+        .values('author_id').annotate(latest=Max('pub_date'))
+        .values_list('author_id', 'latest')
+    )
+    for author_id in celebrities:
+        backfill(user.pk, author_id, since=latest.get(author_id))
+
+
+def follow_feed(user):
+    """Записи ленты подписок пользователя, от новых к старым."""
+    pull_celebrities(user)
+    return FeedEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group').order_by(*FOLLOW_FEED_KEYS)
@@ -1,4 +1,4 @@
-from django.forms import ModelForm, Textarea
+from django.forms import ModelForm, Textarea, ValidationError
 
 from .models import Comment, Post
 
@@ -8,6 +8,21 @@ class PostForm(ModelForm):
         model = Post
         fields = ('title', 'subtitle', 'text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Картинку, отклонённую ещё при загрузке (posts.uploads), поле
+        # не проверяет: его ошибка заменила бы настоящую причину
+        image = self.files.get('image')
+        self.image_error = getattr(image, 'upload_error', None)
+        if self.image_error:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.image_error:
+            raise ValidationError(self.image_error)
+        return self.cleaned_data['image']
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,327 @@
+import fcntl
+import os
+import struct
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from . import trending
+from .models import Like, Post, User
+from .signals import change_post_counter
+
+# Очередь лайков при LIKES_WRITE_BEHIND -- файлы рядом с LIKES_LOG_PATH.
+# В журнал (LOG) запросы дописывают переключения: пары (пользователь,
+# пост) фиксированной длины. flush переименовывает журнал в FLUSHING,
+# переводит переключения в итоговые состояния лайков INTENTS и приводит
+# к ним Like. LOCK -- файл блокировки, которую держит flush
+LOG = ''
+FLUSHING = '.flushing'
+INTENTS = '.intents'
+LOCK = '.lock'
+TOGGLE = struct.Struct('<QQ')
+INTENT = struct.Struct('<QQ?')
+
+
+def toggle_like(user, post_id):
+    """Снимает лайк пользователя, если он есть, иначе ставит.
+    Возвращает, стоит ли теперь лайк.
+
+    Сначала выполняется удаление, и только если удалять нечего --
+    вставка. Если тот же лайк одновременно поставил другой запрос
+    (двойной клик), вставка упирается в ограничение unique_like и лайк
+    просто остаётся поставленным. При LIKES_WRITE_BEHIND лайк не пишется
+    в БД, а ставится в очередь (см. enqueue).
+    """
+    if settings.LIKES_WRITE_BEHIND:
+        return enqueue(user.pk, post_id)
+    deleted, _ = Like.objects.filter(user=user, post_id=post_id).delete()
+    if deleted:
+        return False
+    try:
+        with transaction.atomic():
+            Like.objects.create(user=user, post_id=post_id)
+    except IntegrityError:
+        return True
+    trending.record(post_id, 'like')
+    return True
+
+
+def enqueue(user_id, post_id):
+    """Ставит в очередь переключение лайка и возвращает новое состояние.
+
+    Переключение -- одна дописанная в журнал запись, БД при этом только
+    читается. Два одновременных клика дают две записи, то есть два
+    переключения, а не два одинаковых лайка. Пока переключение не
+    записано в Like, mark_liked и likes_count учитывают его сами, так что
+    пользователь сразу видит свой лайк. Как только в журнале набирается
+    LIKES_FLUSH_SIZE записей, запрос записывает очередь в Like; остальное
+    записывает команда flush_likes.
+    """
+    size = append(TOGGLE.pack(user_id, post_id))
+    state = pending_likes({post_id}, user_id).get((user_id, post_id))
+    if size // TOGGLE.size >= settings.LIKES_FLUSH_SIZE:
+        flush()
+    if state is None:
+        # Очередь успел записать другой процесс
+        return Like.objects.filter(user_id=user_id, post_id=post_id).exists()
+    return state[0]
+
+
+def log_path(suffix=LOG):
+    return settings.LIKES_LOG_PATH + suffix
+
+
+def append(record):
+    """Дописывает record в журнал одним вызовом write с O_APPEND
+    и возвращает длину журнала после записи в байтах.
+
+    Запись идёт под разделяемой блокировкой журнала: flush, переименовав
+    журнал, ждёт её снятия. Если журнал переименовали, пока запрос его
+    открывал, запись повторяется в новый журнал.
+    """
+    path = log_path()
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                current = os.stat(path).st_ino
+            except FileNotFoundError:
+                continue
+            if current == os.fstat(fd).st_ino:
+                os.write(fd, record)
+                return os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+
+
+def read_records(suffix, record):
+    try:
+        with open(log_path(suffix), 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return []
+    # Недописанный хвост чужой записи пропускаем
+    return list(record.iter_unpack(data[:len(data) - len(data) % record.size]))
+
+
+def file_size(suffix):
+    try:
+        return os.stat(log_path(suffix)).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def queue_depth():
+    """Сколько записей очереди ещё не записано в Like. Считается по
+    длине файлов очереди, сами файлы не читаются.
+    """
+    return (file_size(LOG) // TOGGLE.size
+            + file_size(FLUSHING) // TOGGLE.size
+            + file_size(INTENTS) // INTENT.size)
+
+
+def pending():
+    """Содержимое очереди: итоговые состояния из INTENTS и число
+    переключений каждой пары (пользователь, пост) в FLUSHING и журнале.
+    """
+    toggles = Counter(read_records(FLUSHING, TOGGLE))
+    intents = {(user_id, post_id): liked
+               for user_id, post_id, liked in read_records(INTENTS, INTENT)}
+    if intents:
+        # FLUSHING уже переведён в INTENTS
+        toggles.clear()
+    toggles.update(read_records(LOG, TOGGLE))
+    return intents, toggles
+
+
+def pending_likes(post_ids, user_id=None):
+    """Лайки постов post_ids (и только пользователя user_id, если он
+    задан), которые затрагивает очередь: {(пользователь, пост):
+    (стоит ли лайк с учётом очереди, есть ли он в Like)}.
+    """
+    intents, toggles = pending()
+    pairs = {pair for pair in (*intents, *toggles)
+             if pair[1] in post_ids and user_id in (None, pair[0])}
+    if not pairs:
+        return {}
+    existing = set(Like.objects.filter(
+        user_id__in={user_id for user_id, _ in pairs},
+        post_id__in={post_id for _, post_id in pairs},
+    ).values_list('user_id', 'post_id'))
+    return {
+        pair: (intents.get(pair, pair in existing) != bool(toggles[pair] % 2),
+               pair in existing)
+        for pair in pairs
+    }
+
+
+def flush(batch_size=1000):
+    """Записывает очередь в Like пачками по batch_size лайков, каждую
+    в одной транзакции. Возвращает число записанных лайков; если очередь
+    уже записывает другой процесс -- 0.
+
+    Блокировка -- flock файла LOCK, поэтому она общая для всех воркеров
+    и снимается сама, если процесс упал.
+    """
+    fd = os.open(log_path(LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0
+        total = 0
+        if os.path.exists(log_path(INTENTS)):
+            # Прошлая запись не закончилась: FLUSHING, если он остался,
+            # уже переведён в INTENTS
+            remove(FLUSHING)
+            total += apply_intents(batch_size)
+        prepare(batch_size)
+        return total + apply_intents(batch_size)
+    finally:
+        os.close(fd)
+
+
+def remove(suffix):
+    try:
+        os.unlink(log_path(suffix))
+    except FileNotFoundError:
+        pass
+
+
+def prepare(batch_size):
+    """Переводит переключения из журнала в итоговые состояния INTENTS.
+
+    Журнал переименовывается в FLUSHING, и новые переключения пишутся уже
+    в новый журнал. Нечётное число переключений пары меняет то, что
+    сейчас в Like, чётное -- ничего. INTENTS можно записывать в Like
+    сколько угодно раз, поэтому падение посреди записи ничего не портит.
+    """
+    flushing = log_path(FLUSHING)
+    if not os.path.exists(flushing):
+        try:
+            os.rename(log_path(), flushing)
+        except FileNotFoundError:
+            return
+    fd = os.open(flushing, os.O_RDONLY)
+    try:
+        # Ждём запросы, которые открыли журнал до переименования
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    finally:
+        os.close(fd)
+    toggles = Counter(read_records(FLUSHING, TOGGLE))
+    pairs = [pair for pair, count in toggles.items() if count % 2]
+    intents = []
+    for start in range(0, len(pairs), batch_size):
+        batch = pairs[start:start + batch_size]
+        existing = set(Like.objects.filter(pairs_condition(batch))
+                       .values_list('user_id', 'post_id'))
+        intents.extend(INTENT.pack(user_id, post_id,
+                                   (user_id, post_id) not in existing)
+                       for user_id, post_id in batch)
+    if intents:
+        temporary = log_path(INTENTS + '.tmp')
+        with open(temporary, 'wb') as file:
+            file.write(b''.join(intents))
+            file.flush()
+            os.fsync(file.fileno())
+        os.rename(temporary, log_path(INTENTS))
+    remove(FLUSHING)
+
+
+def apply_intents(batch_size):
+    intents = read_records(INTENTS, INTENT)
+    for start in range(0, len(intents), batch_size):
+        apply(intents[start:start + batch_size])
+    remove(INTENTS)
+    return len(intents)
+
+
+def pairs_condition(pairs):
+    condition = Q()
+    for user_id, post_id in pairs:
+        condition |= Q(user_id=user_id, post_id=post_id)
+    return condition
+
+
+def apply(batch):
+    """Приводит Like к итоговым состояниям batch в одной транзакции.
+
+    Счётчики и популярность меняются ровно на те строки Like, которые
+    действительно добавлены или удалены, поэтому повторная запись той же
+    пачки ничего не меняет. Лайки удалённых постов и пользователей
+    пропускаются.
+    """
+    liked = [(user_id, post_id) for user_id, post_id, value in batch
+             if value]
+    unliked = [(user_id, post_id) for user_id, post_id, value in batch
+               if not value]
+    with transaction.atomic():
+        if liked:
+            condition = pairs_condition(liked)
+            before = set(Like.objects.filter(condition).values_list(
+                'user_id', 'post_id'))
+            posts = set(Post.objects.filter(
+                pk__in={post_id for _, post_id in liked},
+            ).values_list('pk', flat=True))
+            users = set(User.objects.filter(
+                pk__in={user_id for user_id, _ in liked},
+            ).values_list('pk', flat=True))
+            Like.objects.bulk_create(
+                [Like(user_id=user_id, post_id=post_id)
+                 for user_id, post_id in liked
+                 if (user_id, post_id) not in before
+                 and post_id in posts and user_id in users],
+                ignore_conflicts=True,
+            )
+            created = set(Like.objects.filter(condition).values_list(
+                'user_id', 'post_id')) - before
+            # bulk_create не вызывает сигналы, поэтому счётчики
+            # и популярность обновляются здесь, по одному запросу на пост
+            for post_id, count in Counter(
+                    post_id for _, post_id in created).items():
+                change_post_counter(post_id, 'likes_count', count)
+                trending.record(post_id, 'like', count=count)
+        if unliked:
+            # Удаление вызывает сигналы само, по одному на удалённый лайк
+            Like.objects.filter(pairs_condition(unliked)).delete()
+
+
+def mark_liked(posts, user):
+    """Отмечает атрибутом liked посты страницы, которые лайкнул user.
+    Лайки всех постов читаются одним запросом; для анонимов запросов
+    нет вовсе. При LIKES_WRITE_BEHIND учитываются ещё не записанные
+    в БД лайки: и флаг, и likes_count.
+    """
+    posts = list(posts)
+    liked = set()
+    if user.is_authenticated and posts:
+        liked = set(Like.objects.filter(
+            user=user, post_id__in=[post.pk for post in posts],
+        ).values_list('post_id', flat=True))
+    for post in posts:
+        post.liked = post.pk in liked
+    if not settings.LIKES_WRITE_BEHIND or not posts:
+        return
+    deltas = Counter()
+    pending_liked = {}
+    for (user_id, post_id), (value, existed) in pending_likes(
+            {post.pk for post in posts}).items():
+        deltas[post_id] += value - existed
+        if user_id == user.pk:
+            pending_liked[post_id] = value
+    for post in posts:
+        post.likes_count = max(post.likes_count + deltas[post.pk], 0)
+        post.liked = pending_liked.get(post.pk, post.liked)
+
+
+def likes_count(post_id):
+    """Число лайков поста вместе с ещё не записанными в Like."""
+    count = Post.objects.filter(pk=post_id).values_list(
+        'likes_count', flat=True).get()
+    if settings.LIKES_WRITE_BEHIND:
+        count += sum(value - existed for value, existed in
+                     pending_likes({post_id}).values())
+    return max(count, 0)
@@ -0,0 +1,71 @@
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from yatube.sqlite_cache import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость операций LocMemCache, FileBasedCache '
+            'и общего кэша SQLiteCache.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keys', type=int, default=1000,
+            help='Сколько разных ключей использовать.')
+        parser.add_argument(
+            '--size', type=int, default=4096,
+            help='Размер значения в байтах (примерно как у карточки поста).')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторить замер (берётся медиана).')
+
+    def handle(self, *args, keys, size, repeat, **options):
+        directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {'MAX_ENTRIES': keys * 2}}
+        backends = {
+            'LocMemCache': LocMemCache('bench', params),
+            'FileBasedCache': FileBasedCache(
+                os.path.join(directory, 'files'), params),
+            'SQLiteCache': SQLiteCache(
+                os.path.join(directory, 'cache.sqlite3'), params),
+        }
+        value = 'x' * size
+        names = [f'key{number}' for number in range(keys)]
+
+        self.stdout.write(f'Ключей: {keys}, значение: {size} байт; '
+                          f'микросекунд на операцию')
+        self.stdout.write(f'{"бэкенд":>15} {"set":>8} {"get":>8} '
+                          f'{"miss":>8} {"incr":>8}')
+        try:
+            for name, cache in backends.items():
+                cache.set('counter', 0, timeout=None)
+                timings = [
+                    self.measure(repeat, keys, lambda: [
+                        cache.set(key, value) for key in names]),
+                    self.measure(repeat, keys, lambda: [
+                        cache.get(key) for key in names]),
+                    self.measure(repeat, keys, lambda: [
+                        cache.get(f'missing{key}') for key in names]),
+                    self.measure(repeat, keys, lambda: [
+                        cache.incr('counter') for _ in names]),
+                ]
+                self.stdout.write(f'{name:>15} ' + ' '.join(
+                    f'{timing:>8.1f}' for timing in timings))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    def measure(repeat, operations, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(
+                (time.perf_counter() - start) * 1000000 / operations)
+        return statistics.median(timings)
@@ -0,0 +1,120 @@
+import os
+import statistics
+import time
+from importlib import import_module
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from posts.models import User
+
+PROFILES = ('development', 'production')
+
+# Настройки профиля, которые меняются на время замера
+PROFILE_SETTINGS = ('DEBUG', 'MIDDLEWARE', 'SESSION_ENGINE', 'TEMPLATES')
+
+
+def start_response(status, headers):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время обработки запроса целиком (middleware, '
+            'сессии, соединение с БД, шаблоны) с настройками профилей '
+            'development и production из yatube/settings.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'urls', nargs='*',
+            help='Адреса для замера; по умолчанию -- страница об авторе '
+                 'и главная.')
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Сколько раз запрашивать каждый адрес (берётся медиана).')
+        parser.add_argument(
+            '--username',
+            help='От чьего имени выполнять запросы; по умолчанию -- '
+                 'анонимно.')
+
+    def handle(self, *args, urls, repeat, username, **options):
+        user = None
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {username}.')
+        urls = urls or [reverse('about:author'), reverse('index')]
+
+        # Ключ профиля в замере не используется, но без него профиль
+        # production не импортируется
+        with mock.patch.dict(os.environ, {
+                'DJANGO_SECRET_KEY': settings.SECRET_KEY, **os.environ}):
+            profiles = [import_module(f'yatube.settings.{name}')
+                        for name in PROFILES]
+        for profile in profiles:
+            missing = set(profile.INSTALLED_APPS) - set(
+                settings.INSTALLED_APPS)
+            if missing:
+                raise CommandError(
+                    f'Не установлены приложения {", ".join(missing)}: '
+                    f'запускайте с профилем development.')
+
+        self.stdout.write(f'{"адрес":<24}' + ''.join(
+            f'{name + ", мс":>18}' for name in PROFILES))
+        timings = {url: [] for url in urls}
+        for profile in profiles:
+            with self.use_profile(profile):
+                handler = WSGIHandler()
+                cookie = self.session_cookie(user)
+                for url in urls:
+                    timings[url].append(
+                        self.measure(repeat, handler, url, cookie))
+        for url, values in timings.items():
+            self.stdout.write(f'{url:<24}' + ''.join(
+                f'{value:>18.2f}' for value in values))
+
+    @staticmethod
+    def use_profile(profile):
+        """Применяет настройки профиля, которые можно поменять на ходу.
+        CONN_MAX_AGE меняется у уже созданного соединения.
+        """
+        connection = connections['default']
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = profile.DATABASES[
+            'default'].get('CONN_MAX_AGE', 0)
+        return override_settings(**{
+            name: getattr(profile, name, getattr(settings, name))
+            for name in PROFILE_SETTINGS})
+
+    @staticmethod
+    def session_cookie(user):
+        """Cookie сессии, в которой выполнен вход user, или пустая строка."""
+        if user is None:
+            return ''
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    @staticmethod
+    def measure(repeat, handler, url, cookie):
+        factory = RequestFactory()
+        timings = []
+        # Первый запрос заполняет кэши и в замер не входит
+        for number in range(repeat + 1):
+            environ = factory.get(url, HTTP_COOKIE=cookie).environ
+            start = time.perf_counter()
+            response = handler(environ, start_response)
+            b''.join(response)
+            response.close()
+            if number:
+                timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
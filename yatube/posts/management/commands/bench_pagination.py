@@ -0,0 +1,83 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.utils import timezone
+
+from posts.models import Post, User
+from posts.paginators import CursorPaginator
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время выборки страниц главной ленты при '
+            'нумерованной (OFFSET) и курсорной пагинации.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, nargs='+',
+            default=[1, 10, 100, 1000, 10000],
+            help='Номера страниц для замера.')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз выбирать каждую страницу (берётся медиана).')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Предварительно создать столько синтетических постов.')
+
+    def handle(self, *args, pages, repeat, seed, **options):
+        if seed:
+            self.seed(seed)
+
+        queryset = Post.objects.for_feed()
+        per_page = settings.PAGINATOR_PER_PAGE
+        total = queryset.count()
+        cursor_paginator = CursorPaginator(queryset, per_page)
+
+        self.stdout.write(f'Постов: {total}, на странице: {per_page}')
+        self.stdout.write(f'{"страница":>10} {"OFFSET, мс":>12} '
+                          f'{"курсор, мс":>12}')
+        for number in pages:
+            offset = (number - 1) * per_page
+            if offset >= total:
+                self.stdout.write(f'{number:>10} нет такой страницы')
+                continue
+            cursor = None
+            if offset:
+                previous = queryset.order_by(
+                    *cursor_paginator.keys)[offset - 1]
+                cursor = cursor_paginator.make_cursor('next', previous)
+
+            numbered = self.measure(repeat, lambda: list(
+                Paginator(queryset, per_page).page(number)))
+            keyset = self.measure(repeat, lambda: list(
+                cursor_paginator.get_page(cursor)))
+            self.stdout.write(
+                f'{number:>10} {numbered:>12.2f} {keyset:>12.2f}')
+
+    @staticmethod
+    def measure(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def seed(self, count, batch_size=10000):
+        author, _ = User.objects.get_or_create(username='benchmark')
+        now = timezone.now()
+        for start in range(0, count, batch_size):
+            Post.objects.bulk_create(
+                Post(
+                    author=author,
+                    text=f'Синтетический пост {number}',
+                    pub_date=now - timedelta(seconds=number),
+                )
+                for number in range(start, min(start + batch_size, count))
+            )
+        self.stdout.write(
+            f'Создано постов: {count}. Счётчики профилей обновит '
+            f'команда rebuild_counters.')
@@ -0,0 +1,117 @@
+import statistics
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from posts.models import Group, Post, User
+
+SOURCES = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# Название, загрузчики и режим отладки шаблонов
+PROFILES = (
+    ('с диска', SOURCES, True),
+    ('кэш', [('django.template.loaders.cached.Loader', SOURCES)], False),
+    ('встраивание',
+     [('yatube.template_loader.InliningLoader', SOURCES)], False),
+)
+
+
+def make_backend(loaders, debug):
+    params = {**settings.TEMPLATES[0]}
+    params.pop('BACKEND')
+    options = {**params['OPTIONS'], 'loaders': loaders, 'debug': debug}
+    return DjangoTemplates({**params, 'NAME': 'bench', 'APP_DIRS': False,
+                            'OPTIONS': options})
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время отрисовки шаблонов страниц сайта: '
+            'с чтением с диска при каждой отрисовке (как при DEBUG), '
+            'с кэшем скомпилированных шаблонов и с кэшем и встроенными '
+            'include (yatube.template_loader.InliningLoader).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Сколько раз отрисовывать каждый шаблон (берётся медиана).')
+        parser.add_argument(
+            '--username',
+            help='От чьего имени открывать страницы; по умолчанию -- '
+                 'автор последнего поста.')
+
+    def handle(self, *args, repeat, username, **options):
+        post = Post.objects.select_related('author').first()
+        if post is None:
+            raise CommandError('Нет ни одного поста.')
+        user = post.author
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {username}.')
+
+        pages = self.capture(user, self.urls(post))
+        backends = [make_backend(loaders, debug)
+                    for _, loaders, debug in PROFILES]
+        self.stdout.write(f'{"шаблон":<14}' + ''.join(
+            f'{name + ", мс":>18}' for name, _, _ in PROFILES))
+        for template_name, request, context in pages:
+            timings = [self.measure(repeat, backend, template_name,
+                                    request, context)
+                       for backend in backends]
+            self.stdout.write(f'{template_name:<14}' + ''.join(
+                f'{timing:>18.2f}' for timing in timings))
+
+    @staticmethod
+    def urls(post):
+        urls = [
+            reverse('index'),
+            reverse('trending'),
+            reverse('follow_index'),
+            reverse('profile', args=(post.author.username,)),
+            reverse('post', args=(post.author.username, post.pk)),
+            f'{reverse("search")}?q={post.text.split()[0]}',
+        ]
+        group = Group.objects.first()
+        if group is not None:
+            urls.append(reverse('group', args=(group.slug,)))
+        return urls
+
+    @staticmethod
+    def capture(user, urls):
+        """Выполняет представления и возвращает (шаблон, запрос, контекст)
+        для каждой страницы, не отрисовывая их.
+        """
+        pages = []
+
+        def render(request, template_name, context=None, *args, **kwargs):
+            pages.append((template_name, request, context or {}))
+            return HttpResponse()
+
+        factory = RequestFactory()
+        with mock.patch('posts.views.render', render):
+            for url in urls:
+                request = factory.get(url)
+                request.user = user
+                match = resolve(request.path_info)
+                match.func(request, *match.args, **match.kwargs)
+        return pages
+
+    @staticmethod
+    def measure(repeat, backend, template_name, request, context):
+        # Первая отрисовка заполняет кэш и в замер не входит
+        backend.get_template(template_name).render(context, request)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            backend.get_template(template_name).render(context, request)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,55 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts.media_gc import MediaCollector, load_state, save_state
+
+
+class Command(BaseCommand):
+    help = ('Удаляет из MEDIA_ROOT картинки, на которые не ссылаются посты, '
+            'их миниатюры и варианты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено. Миниатюры удалённых '
+                 'картинок попадают в отчёт после реального запуска.')
+        parser.add_argument(
+            '--time-budget', type=float,
+            help='Остановиться через столько секунд; вместе с --state '
+                 'следующий запуск продолжит с того же места.')
+        parser.add_argument(
+            '--state',
+            help='Файл, в котором хранится положение обхода.')
+        parser.add_argument(
+            '--min-age', type=float, default=3600,
+            help='Не трогать файлы моложе стольких секунд.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько файлов или записей проверять за один запрос.')
+
+    def handle(self, *args, dry_run, time_budget, state, min_age,
+               batch_size, **options):
+        saved = load_state(state)
+        if saved:
+            self.stdout.write(
+                f'Продолжение с этапа {saved["stage"]}: {saved["position"]}')
+        collector = MediaCollector(
+            dry_run=dry_run, time_budget=time_budget, min_age=min_age,
+            batch_size=batch_size, state=saved)
+        on_batch = (lambda current: save_state(state, current)) if (
+            state and not dry_run) else None
+        finished = collector.run(on_batch=on_batch)
+
+        for name, value in collector.stats.items():
+            self.stdout.write(f'{name}: {value}')
+        if not finished:
+            if state and not dry_run:
+                save_state(state, collector.state)
+            self.stdout.write(self.style.WARNING(
+                'Время вышло, запустите команду ещё раз, чтобы продолжить'))
+            return
+        if state and not dry_run and os.path.exists(state):
+            os.remove(state)
+        self.stdout.write(self.style.SUCCESS(
+            'Проверка завершена' if dry_run else 'Мусор удалён'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import compact
+
+
+class Command(BaseCommand):
+    help = ('Удаляет затухший счёт популярности постов, чтобы таблица '
+            'популярного оставалась небольшой. Запускайте по расписанию.')
+
+    def handle(self, *args, **options):
+        deleted = compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей о популярности: {deleted}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.likes import flush, queue_depth
+
+
+class Command(BaseCommand):
+    help = ('Записывает в БД лайки из очереди (LIKES_WRITE_BEHIND). '
+            'Запускайте по расписанию, например раз в несколько секунд.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depth', action='store_true',
+            help='Только вывести число лайков в очереди, например '
+                 'для мониторинга.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько лайков записывать в одной транзакции.')
+
+    def handle(self, *args, depth, batch_size, **options):
+        if depth:
+            self.stdout.write(str(queue_depth()))
+            return
+        flushed = flush(batch_size=batch_size)
+        self.stdout.write(f'Записано лайков: {flushed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Осталось в очереди: {queue_depth()}'))
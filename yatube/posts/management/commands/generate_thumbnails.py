@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие миниатюры картинок постов, например '
+            'для картинок, загруженных до появления фоновой обработки.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        count = 0
+        for post_id, image in posts.values_list('pk', 'image').iterator():
+            generate(post_id, Post(pk=post_id, image=image).image)
+            count += 1
+        self.stdout.write(f'Обработано картинок: {count}')
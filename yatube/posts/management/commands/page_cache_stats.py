@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import page_cache_stats, reset_page_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает статистику кэша страниц для анонимных посетителей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода.')
+
+    def handle(self, *args, reset, **options):
+        stats = page_cache_stats()
+        total = sum(stats.values())
+        for outcome, count in stats.items():
+            share = count / total * 100 if total else 0
+            self.stdout.write(f'{outcome:>6}: {count} ({share:.1f}%)')
+        if reset:
+            reset_page_cache_stats()
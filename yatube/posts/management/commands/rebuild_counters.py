@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.counters import COUNTERS, create_missing_profiles, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики постов, профилей '
+            'и ссылок на картинки или проверяет их с ключом --check.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить счётчики, ничего не изменяя.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько объектов обновлять за один запрос.')
+
+    def handle(self, *args, check, batch_size, **options):
+        if not check:
+            created = create_missing_profiles()
+            if created:
+                self.stdout.write(f'Создано профилей: {created}')
+
+        total = 0
+        for model in COUNTERS:
+            found = rebuild_counters(
+                model, batch_size=batch_size, dry_run=check)
+            total += found
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'расхождений {found}')
+
+        if check and total:
+            raise CommandError(f'Найдено расхождений счётчиков: {total}')
+        self.stdout.write(self.style.SUCCESS('Счётчики в порядке'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей добавлять в индекс за один запрос.')
+
+    def handle(self, *args, batch_size, **options):
+        total = search.rebuild(Post, Comment, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов и комментариев: {total}'))
@@ -0,0 +1,248 @@
+import json
+import os
+import time
+from collections import Counter
+
+from django.conf import settings
+from sorl.thumbnail import default as sorl_default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from .models import ImageBlob, ImageVariant, Post
+
+
+class TimeBudgetExceeded(Exception):
+    pass
+
+
+class MediaCollector:
+    """Удаляет из MEDIA_ROOT файлы, на которые ничего не ссылается:
+    картинки, замененные или оставшиеся от удалённых постов, их
+    миниатюры sorl-thumbnail и варианты ImageVariant.
+
+    Работает в три этапа, каждый пачками по batch_size:
+    1. variants -- записи ImageVariant картинок, которых нет у постов;
+    2. thumbnails -- записи хранилища sorl-thumbnail о таких картинках
+       и их миниатюрах;
+    3. files -- обход каталогов картинок, миниатюр и вариантов в порядке
+       сортировки путей; файл удаляется, если на него не ссылается ни
+       пост, ни хранилище sorl-thumbnail, ни ImageVariant.
+    Файлы миниатюр становятся ничейными только после этапа 2, поэтому
+    при dry_run миниатюры удалённых картинок в отчёт ещё не попадают.
+
+    Положение обхода хранится в state, поэтому после остановки
+    по time_budget работа продолжается с того же места. Файлы моложе
+    min_age секунд не трогаются: они могут принадлежать посту, который
+    ещё не сохранён, или миниатюре, которая ещё создаётся.
+    """
+    STAGES = ('variants', 'thumbnails', 'files')
+
+    def __init__(self, dry_run=False, time_budget=None, min_age=3600,
+                 batch_size=1000, state=None):
+        self.dry_run = dry_run
+        self.deadline = (time.monotonic() + time_budget
+                         if time_budget is not None else None)
+        self.min_age = min_age
+        self.batch_size = batch_size
+        self.state = state or {'stage': self.STAGES[0], 'position': None}
+        self.stats = Counter()
+        self.roots = {
+            sorl_settings.THUMBNAIL_PREFIX.strip('/'): self.live_thumbnails,
+            upload_dir(Post, 'image'): self.live_images,
+            upload_dir(ImageVariant, 'image'): self.live_variants,
+        }
+
+    def run(self, on_batch=None):
+        """Выполняет оставшиеся этапы. Возвращает False, если работа
+        остановлена по time_budget. on_batch вызывается после каждой
+        пачки, например чтобы сохранить state.
+        """
+        stages = {
+            'variants': self.collect_variants,
+            'thumbnails': self.collect_thumbnails,
+            'files': self.collect_files,
+        }
+        try:
+            for stage in self.STAGES[self.STAGES.index(self.state['stage']):]:
+                if stage != self.state['stage']:
+                    self.state = {'stage': stage, 'position': None}
+                for _ in stages[stage]():
+                    if on_batch is not None:
+                        on_batch(self.state)
+                    if (self.deadline is not None
+                            and time.monotonic() > self.deadline):
+                        raise TimeBudgetExceeded
+        except TimeBudgetExceeded:
+            return False
+        self.state = {'stage': None, 'position': None}
+        return True
+
+    def collect_variants(self):
+        rows = ImageVariant.objects.order_by('pk').values_list('pk', 'source')
+        while True:
+            last_pk = self.state['position']
+            page = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+            batch = list(page[:self.batch_size])
+            if not batch:
+                return
+            live = self.live_images({source for _, source in batch})
+            orphans = [pk for pk, source in batch if source not in live]
+            if orphans and not self.dry_run:
+                ImageVariant.objects.filter(pk__in=orphans).delete()
+            self.stats['записей ImageVariant'] += len(orphans)
+            self.state['position'] = batch[-1][0]
+            yield
+
+    def collect_thumbnails(self):
+        prefix = add_prefix('', 'thumbnails')
+        rows = KVStore.objects.filter(key__startswith=prefix).order_by(
+            'key').values_list('key', 'value')
+        while True:
+            last_key = self.state['position']
+            page = rows if last_key is None else rows.filter(key__gt=last_key)
+            batch = list(page[:self.batch_size])
+            if not batch:
+                return
+            source_keys = {key: add_prefix(key[len(prefix):])
+                           for key, _ in batch}
+            sources = {
+                key: deserialize(value)['name']
+                for key, value in KVStore.objects.filter(
+                    key__in=source_keys.values()).values_list('key', 'value')
+            }
+            live = self.live_images(set(sources.values()))
+            orphans = []
+            for key, value in batch:
+                source_key = source_keys[key]
+                if sources.get(source_key) in live:
+                    continue
+                orphans += [key, source_key]
+                orphans += [add_prefix(thumbnail_key)
+                            for thumbnail_key in deserialize(value)]
+                self.stats['картинок в хранилище sorl-thumbnail'] += 1
+            if orphans and not self.dry_run:
+                sorl_default.kvstore._delete_raw(*orphans)
+            self.state['position'] = batch[-1][0]
+            yield
+
+    def collect_files(self):
+        resume = tuple(self.state['position'] or ())
+        batch = []
+        for root in sorted(self.roots):
+            directory = os.path.join(settings.MEDIA_ROOT, root)
+            if not os.path.isdir(directory):
+                continue
+            for path, entry in walk(directory, (root,), resume):
+                batch.append((path, entry))
+                if len(batch) >= self.batch_size:
+                    self.collect_batch(batch)
+                    batch = []
+                    yield
+        if batch:
+            self.collect_batch(batch)
+            yield
+
+    def collect_batch(self, batch):
+        now = time.time()
+        by_root = {}
+        for path, entry in batch:
+            stat = entry.stat(follow_symlinks=False)
+            self.stats['файлов просмотрено'] += 1
+            if now - stat.st_mtime < self.min_age:
+                self.stats['файлов моложе min_age'] += 1
+                continue
+            by_root.setdefault(path[0], {})['/'.join(path)] = (entry, stat)
+        for root, files in by_root.items():
+            live = self.roots[root](set(files))
+            removed = []
+            for name, (entry, stat) in files.items():
+                if name in live:
+                    continue
+                if not self.dry_run:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        continue
+                removed.append(name)
+                self.stats['ничейных файлов'] += 1
+                self.stats['байт в ничейных файлах'] += stat.st_size
+            if removed and not self.dry_run and root == upload_dir(
+                    Post, 'image'):
+                # Имена удалённых картинок остаются занятыми
+                # (см. DeduplicatingStorage)
+                ImageBlob.objects.filter(name__in=removed).update(
+                    digest=None, references=0)
+                ImageBlob.objects.bulk_create(
+                    [ImageBlob(name=name) for name in removed],
+                    ignore_conflicts=True)
+        self.state['position'] = list(batch[-1][0])
+
+    @staticmethod
+    def live_images(names):
+        """Картинки из names, на которые ссылаются посты.
+
+        Картинка с положительным ImageBlob.references жива без обращения
+        к постам. Картинки с нулевым счётчиком или без записи ImageBlob
+        перед удалением проверяются по постам: счётчик не учитывает
+        посты из loaddata и изменения через QuerySet.update, пока его не
+        пересчитает rebuild_counters.
+        """
+        live = set(ImageBlob.objects.filter(
+            name__in=names, references__gt=0).values_list('name', flat=True))
+        unreferenced = set(names) - live
+        if unreferenced:
+            live |= set(Post.objects.filter(
+                image__in=unreferenced).values_list('image', flat=True))
+        return live
+
+    @classmethod
+    def live_variants(cls, names):
+        sources = dict(ImageVariant.objects.filter(
+            image__in=names).values_list('image', 'source'))
+        live = cls.live_images(set(sources.values()))
+        return {name for name, source in sources.items() if source in live}
+
+    @staticmethod
+    def live_thumbnails(names):
+        keys = {add_prefix(ImageFile(name, sorl_default.storage).key): name
+                for name in names}
+        return {keys[key] for key in KVStore.objects.filter(
+            key__in=keys).values_list('key', flat=True)}
+
+
+def upload_dir(model, field_name):
+    return model._meta.get_field(field_name).upload_to.strip('/')
+
+
+def walk(directory, relative, resume=()):
+    """Файлы каталога directory с путями в виде кортежей, в порядке
+    сортировки путей. Пропускает всё до resume включительно, не заходя
+    в уже пройденные подкаталоги.
+    """
+    with os.scandir(directory) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        path = relative + (entry.name,)
+        if entry.is_dir(follow_symlinks=False):
+            if path >= resume[:len(path)]:
+                yield from walk(entry.path, path, resume)
+        elif entry.is_file(follow_symlinks=False) and path > resume:
+            yield path, entry
+
+
+def load_state(path):
+    if path and os.path.exists(path):
+        with open(path) as file:
+            return json.load(file)
+    return None
+
+
+def save_state(path, state):
+    """Атомарно записывает положение обхода в файл path."""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(state, file)
+    os.replace(temporary, path)
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0032_image_variant'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagevariant',
+            name='image',
+            field=models.FileField(db_index=True, upload_to='variants/'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
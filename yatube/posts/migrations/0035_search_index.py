@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from posts import search
+
+
+def create_search_index(apps, schema_editor):
+    search.rebuild(apps.get_model('posts', 'Post'),
+                   apps.get_model('posts', 'Comment'),
+                   using=schema_editor.connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    index = search.get_index(schema_editor.connection.alias)
+    if index is not None:
+        index.drop()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0034_image_blob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0037_pending_like'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='PendingLike',
+        ),
+    ]
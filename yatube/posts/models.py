@@ -1,11 +1,54 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router, transaction
 from django.utils import timezone
 
+from .storage import DeduplicatingStorage
+
 User = get_user_model()
 
 
-class Post(models.Model):
+class TrackedModel(models.Model):
+    """Запоминает значения полей tracked_fields на момент загрузки из БД
+    и сохраняет объект в одной транзакции с обработчиками post_save.
+    """
+    tracked_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_tracked_fields()
+        return instance
+
+    def _remember_tracked_fields(self):
+        self._loaded_values = {
+            name: self.__dict__[name]
+            for name in self.tracked_fields if name in self.__dict__
+        }
+
+    def loaded_value(self, name):
+        """Значение поля на момент загрузки из БД (None для новых
+        объектов).
+        """
+        return getattr(self, '_loaded_values', {}).get(name)
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+        self._remember_tracked_fields()
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты вместе с автором и группой для вывода в ленте."""
+        return self.select_related('author', 'group')
+
+
+class Post(TrackedModel):
     title = models.CharField(
         verbose_name='заголовок',
         max_length=25,
@@ -25,6 +68,8 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
+        # Покрывается индексом post_author_date_idx
+        db_index=False,
     )
     group = models.ForeignKey(
         'Group',
@@ -32,6 +77,8 @@ class Post(models.Model):
         blank=True,
         null=True,
         related_name='posts',
+        # Покрывается индексом post_group_date_idx
+        db_index=False,
         verbose_name='группа',
         help_text='Выберите группу, в которую хотите добавить запись'
     )
@@ -39,11 +86,28 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
         null=True,
-        verbose_name='Картинка'
+        verbose_name='Картинка',
+        # По картинке ищут сборщик мусора media и варианты картинок
+        db_index=True,
+        storage=DeduplicatingStorage(),
     )
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    tracked_fields = ('author_id', 'pub_date', 'image')
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -58,11 +122,13 @@ class Group(models.Model):
         return self.title
 
 
-class Comment(models.Model):
+class Comment(TrackedModel):
     post = models.ForeignKey(
         'Post',
         on_delete=models.CASCADE,
         related_name='comments',
+        # Покрывается индексом comment_post_created_idx
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -75,14 +141,20 @@ class Comment(models.Model):
     )
     created = models.DateTimeField('date published', default=timezone.now)
 
+    tracked_fields = ('post_id',)
+
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Follow(models.Model):
+class Follow(TrackedModel):
     # Кто подписан
     user = models.ForeignKey(
         User,
@@ -94,20 +166,30 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='following',
+        # Покрывается индексом follow_author_user_idx
+        db_index=False,
     )
 
+    tracked_fields = ('user_id', 'author_id')
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique_follow'
             ),
         ]
+        indexes = [
+            # Подписчики автора; подписки пользователя покрывает
+            # ограничение unique_follow
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} подписан на {self.author.username}'
 
 
-class Like(models.Model):
+class Like(TrackedModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -117,14 +199,141 @@ class Like(models.Model):
         'Post',
         on_delete=models.CASCADE,
         related_name='likes',
+        # Покрывается индексом like_post_user_idx
+        db_index=False,
     )
 
+    tracked_fields = ('post_id',)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'post'], name='unique_like'
             ),
         ]
+        indexes = [
+            models.Index(fields=['post', 'user'],
+                         name='like_post_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} лайкнул {self.post.text[:15]}'
+
+
+class Profile(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами posts.signals."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    # Сколько пользователей подписано на этого пользователя
+    followers_count = models.PositiveIntegerField(default=0)
+    # На скольких авторов подписан этот пользователь
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Профиль {self.user.username}'
+
+
+class TrendingScore(models.Model):
+    """Популярность поста: логарифм суммы весов его лайков
+    и комментариев, затухающих со временем (см. posts.trending).
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score}'
+
+
+class FeedEntry(models.Model):
+    """Запись во входящей ленте подписок пользователя (fan-out on write).
+
+    Заполняется модулем posts.feeds при публикации поста и при
+    подписке; pub_date и author дублируют поля поста, чтобы лента
+    читалась по индексу без соединения с подписками.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_entry_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_entry_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user.username}'
+
+
+class ImageVariant(models.Model):
+    """Вариант картинки поста определённой ширины и формата для
+    адаптивной разметки <picture>. Создаётся модулем posts.thumbnails
+    вместе с миниатюрами, в шаблонах используются только эти записи,
+    без обращения к файлам.
+    """
+    # Имя исходной картинки в хранилище
+    source = models.CharField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    mime_type = models.CharField(max_length=20)
+    image = models.FileField(upload_to='variants/', db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'mime_type', 'width'],
+                name='unique_image_variant'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.source} {self.mime_type} {self.width}px'
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в DeduplicatingStorage, sha256 его содержимого
+    и число постов, которые на него ссылаются. Число поддерживается
+    сигналами posts.signals, пересчитывается командой rebuild_counters;
+    по нему сборщик мусора (posts.media_gc) считает файл нужным.
+    """
+    # У картинок, загруженных до появления записей, digest неизвестен
+    digest = models.CharField(max_length=64, unique=True, null=True)
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
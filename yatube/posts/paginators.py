@@ -0,0 +1,294 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .cache import get_feed_version
+
+
+class WindowPaginator(Paginator):
+    """Paginator, страницы которого знают номера соседних страниц
+    для ссылок (page_window).
+    """
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.page_window = self.get_page_window(page.number)
+        return page
+
+    def get_page_window(self, number):
+        """Номера страниц вокруг number плюс первая и последняя;
+        пропуски обозначены None.
+        """
+        on_each_side = settings.PAGINATOR_WINDOW
+        last = self.num_pages
+        start = max(number - on_each_side, 1)
+        end = min(number + on_each_side, last)
+        window = list(range(start, end + 1))
+        if start > 1:
+            window = [1] + ([None] if start > 2 else []) + window
+        if end < last:
+            window += ([None] if end < last - 1 else []) + [last]
+        return window
+
+
+class CachedCountPaginator(WindowPaginator):
+    """Paginator, который хранит общее число объектов в кэше.
+
+    Ключ кэша строится по SQL-запросу и версии лент, поэтому сохранение
+    или удаление поста (posts.signals) сбрасывает все счётчики разом.
+    Если объектов больше PAGINATOR_COUNT_THRESHOLD, точный COUNT(*)
+    не выполняется: берётся оценка планировщика PostgreSQL, и
+    count_is_estimated равен True. Для других БД число считается точно
+    (один раз, дальше оно берётся из кэша).
+
+    Оценка может быть как больше, так и меньше настоящего числа, поэтому
+    страница с оценкой выбирает на объект больше и по нему узнаёт, есть ли
+    следующая; номера страниц за оценкой не отклоняются.
+    """
+    count_is_estimated = False
+
+    @cached_property
+    def count(self):
+        query = str(self.object_list.query).encode()
+        key = 'paginator:count:{}:{}'.format(
+            get_feed_version(), hashlib.md5(query).hexdigest())
+        cached = cache.get(key)
+        if cached is None:
+            cached = self._count()
+            cache.set(key, cached, settings.PAGINATOR_COUNT_TIMEOUT)
+        count, self.count_is_estimated = cached
+        return count
+
+    def _count(self):
+        threshold = settings.PAGINATOR_COUNT_THRESHOLD
+        count = self.object_list[:threshold + 1].count()
+        if count <= threshold:
+            return count, False
+        estimate = estimate_count(self.object_list)
+        if estimate is None:
+            return self.object_list.count(), False
+        return max(estimate, threshold), True
+
+    def validate_number(self, number):
+        if not self.count_is_estimated:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def get_page(self, number):
+        # count заодно определяет count_is_estimated
+        self.count
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            # За оценкой постов не оказалось
+            return self.page(1)
+
+    def page(self, number):
+        self.count
+        if not self.count_is_estimated:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not objects and number > 1:
+            raise EmptyPage('На этой странице нет результатов')
+        # Оценка уточняется по тому, что нашлось на странице
+        if len(objects) > self.per_page:
+            count = max(self.count, bottom + len(objects))
+        else:
+            count = bottom + len(objects)
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        return self._get_page(objects[:self.per_page], number, self)
+
+
+def estimate_count(queryset):
+    """Оценка числа строк запроса по плану PostgreSQL; для других БД
+    возвращает None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации.
+
+    В отличие от django.core.paginator.Page не знает своего номера
+    и общего числа страниц, зато ссылается на соседние страницы курсорами.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинация по ключу (keyset): страница выбирается условием
+    на значения ключевых полей последнего показанного объекта, а не
+    OFFSET, поэтому глубокие страницы не медленнее первой.
+
+    keys -- поля сортировки, вместе образующие уникальный ключ;
+    префикс «-» означает сортировку по убыванию.
+    """
+
+    def __init__(self, object_list, per_page, keys=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = keys
+        opts = object_list.model._meta
+        self.fields = [opts.get_field(key.lstrip('-')) for key in keys]
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по курсору; некорректный или пустой курсор
+        означает первую страницу.
+        """
+        try:
+            direction, values = self.decode_cursor(cursor)
+        except ValueError:
+            direction, values = 'next', None
+
+        if direction == 'previous':
+            return self._previous_page(values)
+        return self._next_page(values)
+
+    def _next_page(self, values):
+        queryset = self.object_list.order_by(*self.keys)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, self.keys))
+        objects = list(queryset[:self.per_page + 1])
+        has_next = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        return CursorPage(
+            objects, self,
+            next_cursor=self.make_cursor('next', objects[-1]) if has_next
+            else None,
+            previous_cursor=self.make_cursor('previous', objects[0])
+            if values is not None and objects else None,
+        )
+
+    def _previous_page(self, values):
+        reversed_keys = [self._reverse(key) for key in self.keys]
+        queryset = self.object_list.order_by(*reversed_keys).filter(
+            self._after(values, reversed_keys))
+        objects = list(queryset[:self.per_page + 1])
+        has_previous = len(objects) > self.per_page
+        objects = objects[:self.per_page][::-1]
+        return CursorPage(
+            objects, self,
+            next_cursor=self.make_cursor('next', objects[-1]) if objects
+            else None,
+            previous_cursor=self.make_cursor('previous', objects[0])
+            if has_previous else None,
+        )
+
+    @staticmethod
+    def _reverse(key):
+        return key[1:] if key.startswith('-') else f'-{key}'
+
+    def _after(self, values, keys):
+        """Условие «объект идёт после values при сортировке по keys»."""
+        condition = Q()
+        equal = {}
+        for key, value in zip(keys, values):
+            name = key.lstrip('-')
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # Нестрогая граница по первому ключу позволяет БД начать обход
+        # индекса с нужного места, а не отфильтровывать строки с начала
+        first = keys[0].lstrip('-')
+        lookup = 'lte' if keys[0].startswith('-') else 'gte'
+        return Q(**{f'{first}__{lookup}': values[0]}) & condition
+
+    def make_cursor(self, direction, obj):
+        """Курсор на страницу, которая начинается сразу после obj
+        (direction='next') или заканчивается перед ним ('previous').
+        """
+        values = [field.value_to_string(obj) for field in self.fields]
+        data = json.dumps([direction, *values]).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Разбирает курсор в пару (направление, значения ключей).
+        Для пустого курсора возвращает ('next', None).
+        """
+        if not cursor:
+            return 'next', None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, *raw_values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()))
+            if (direction not in ('next', 'previous')
+                    or len(raw_values) != len(self.fields)):
+                raise ValueError('Некорректный курсор')
+            values = [field.to_python(value)
+                      for field, value in zip(self.fields, raw_values)]
+        except (binascii.Error, TypeError, ValidationError,
+                UnicodeDecodeError) as error:
+            raise ValueError('Некорректный курсор') from error
+        if any(value is None for value in values):
+            raise ValueError('Некорректный курсор')
+        return direction, values
+
+
+def paginate(request, object_list, keys=('-pub_date', '-id')):
+    """Возвращает страницу ленты для запроса.
+
+    ?cursor= включает курсорную пагинацию, ?page=N -- нумерованную.
+    Без параметров режим выбирается настройкой FEED_PAGINATION.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor is None and (
+            settings.FEED_PAGINATION != 'cursor' or 'page' in request.GET):
+        paginator = CachedCountPaginator(
+            object_list, settings.PAGINATOR_PER_PAGE)
+        return paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(
+        object_list, settings.PAGINATOR_PER_PAGE, keys=keys)
+    return paginator.get_page(cursor)
@@ -0,0 +1,327 @@
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+WORD = re.compile(r'\w+')
+VOWEL = re.compile(r'[аеиоуыэюя]')
+NON_VOWEL = re.compile(r'[^аеиоуыэюя]')
+
+# Окончания русского стеммера Snowball. Окончания первой группы
+# отсекаются только после «а» или «я»
+PERFECTIVE_GERUND = re.compile(
+    r'((?<=[ая])(в|вши|вшись)|ив|ивши|ившись|ыв|ывши|ывшись)$')
+REFLEXIVE = re.compile(r'(ся|сь)$')
+ADJECTIVE = (r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему'
+             r'|ому|их|ых|ую|юю|ая|яя|ою|ею)')
+ADJECTIVAL = re.compile(
+    r'((?<=[ая])(ем|нн|вш|ющ|щ)|ивш|ывш|ующ)?' + ADJECTIVE + '$')
+VERB = re.compile(
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)'
+    r'|ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием'
+    r'|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL = re.compile(r'(ост|ость)$')
+SUPERLATIVE = re.compile(r'(ейш|ейше)$')
+
+
+def strip(ending, word):
+    """Отсекает от word окончание ending; возвращает (слово, отсечено ли)."""
+    match = ending.search(word)
+    if match is None:
+        return word, False
+    return word[:match.start()], True
+
+
+def region(word, start=0):
+    """Начало области R1 (R2 при start = R1) стеммера Snowball."""
+    vowel = VOWEL.search(word, start)
+    if vowel is None:
+        return len(word)
+    non_vowel = NON_VOWEL.search(word, vowel.end())
+    return len(word) if non_vowel is None else non_vowel.end()
+
+
+def stem(word):
+    """Основа русского слова по алгоритму Snowball; слова без русских
+    гласных возвращаются как есть.
+    """
+    word = word.lower().replace('ё', 'е')
+    vowel = VOWEL.search(word)
+    if vowel is None:
+        return word
+    prefix, rv = word[:vowel.end()], word[vowel.end():]
+    r2 = region(word, region(word)) - len(prefix)
+
+    rv, found = strip(PERFECTIVE_GERUND, rv)
+    if not found:
+        rv, _ = strip(REFLEXIVE, rv)
+        for ending in (ADJECTIVAL, VERB, NOUN):
+            rv, found = strip(ending, rv)
+            if found:
+                break
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    match = DERIVATIONAL.search(rv)
+    if match is not None and match.start() >= r2:
+        rv = rv[:match.start()]
+    rv, found = strip(SUPERLATIVE, rv)
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif not found and rv.endswith('ь'):
+        rv = rv[:-1]
+    return prefix + rv
+
+
+def terms(text):
+    """Основы слов текста в порядке следования."""
+    return [stem(word) for word in WORD.findall(text.lower())]
+
+
+def post_entry(pk, title, subtitle, text):
+    """Строка индекса поста: (ключ, пост, текст поста, текст комментария).
+    Ключи постов чётные, комментариев -- нечётные.
+    """
+    return pk * 2, pk, ' '.join((title or '', subtitle or '', text)), ''
+
+
+def comment_entry(pk, post_id, text):
+    return pk * 2 + 1, post_id, '', text
+
+
+class SQLiteIndex:
+    """Индекс в виртуальной таблице FTS5. Русских основ FTS5 не знает,
+    поэтому в таблицу и в запросы попадают основы, посчитанные stem.
+    """
+    table = 'posts_search'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING '
+                f'fts5(post_text, comment_text, post_id UNINDEXED, '
+                f"tokenize = 'unicode61 remove_diacritics 0')")
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def save(self, entries):
+        entries = [(key, post_id, ' '.join(terms(post_text)),
+                    ' '.join(terms(comment_text)))
+                   for key, post_id, post_text, comment_text in entries]
+        self.delete([entry[0] for entry in entries])
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} '
+                f'(rowid, post_id, post_text, comment_text) '
+                f'VALUES (%s, %s, %s, %s)', entries)
+
+    def delete(self, keys):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(key,) for key in keys])
+
+    @staticmethod
+    def match(query):
+        words = terms(query)[:settings.SEARCH_MAX_TERMS]
+        return ' '.join(f'"{word}"' for word in words) or None
+
+    def search(self, match, offset, limit):
+        # Совпадение в тексте поста весит вдвое больше, чем в комментарии.
+        # bm25 нельзя вызывать внутри агрегата, а LIMIT -1 не даёт SQLite
+        # встроить подзапрос во внешний
+        return self.fetch(
+            f'SELECT post_id FROM (SELECT post_id, '
+            f'bm25({self.table}, 2.0, 1.0) AS score FROM {self.table} '
+            f'WHERE {self.table} MATCH %s LIMIT -1) GROUP BY post_id '
+            f'ORDER BY min(score), post_id DESC '
+            f'LIMIT %s OFFSET %s', [match, limit, offset])
+
+    def count(self, match):
+        return self.fetch(
+            f'SELECT count(DISTINCT post_id) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s', [match])[0]
+
+    def matching(self, match, comments):
+        """Подзапрос с ключами постов или комментариев по запросу."""
+        return (
+            f'SELECT rowid >> 1 FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND (rowid & 1) = %s',
+            [match, int(comments)])
+
+    def fetch(self, sql, params):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLIndex(SQLiteIndex):
+    """Индекс в таблице с tsvector и GIN-индексом; основы слов считает
+    встроенный в PostgreSQL русский стеммер.
+    """
+    query = "plainto_tsquery('russian', %s)"
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} '
+                f'(id bigint PRIMARY KEY, post_id integer NOT NULL, '
+                f'document tsvector NOT NULL)')
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {self.table}_document_idx '
+                f'ON {self.table} USING gin (document)')
+
+    def save(self, entries):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (id, post_id, document) '
+                f"VALUES (%s, %s, setweight(to_tsvector('russian', %s), 'A')"
+                f" || setweight(to_tsvector('russian', %s), 'B')) "
+                f'ON CONFLICT (id) DO UPDATE SET post_id = EXCLUDED.post_id, '
+                f'document = EXCLUDED.document', entries)
+
+    def delete(self, keys):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE id = ANY(%s)',
+                           [list(keys)])
+
+    @staticmethod
+    def match(query):
+        words = WORD.findall(query)[:settings.SEARCH_MAX_TERMS]
+        return ' '.join(words) or None
+
+    def search(self, match, offset, limit):
+        return self.fetch(
+            f'SELECT post_id FROM {self.table} '
+            f'WHERE document @@ {self.query} GROUP BY post_id '
+            f'ORDER BY max(ts_rank(document, {self.query})) DESC, '
+            f'post_id DESC LIMIT %s OFFSET %s', [match, match, limit, offset])
+
+    def count(self, match):
+        return self.fetch(
+            f'SELECT count(DISTINCT post_id) FROM {self.table} '
+            f'WHERE document @@ {self.query}', [match])[0]
+
+    def matching(self, match, comments):
+        return (
+            f'SELECT id >> 1 FROM {self.table} '
+            f'WHERE document @@ {self.query} AND (id & 1) = %s',
+            [match, int(comments)])
+
+
+INDEXES = {
+    'sqlite': SQLiteIndex,
+    'postgresql': PostgreSQLIndex,
+}
+
+
+def get_index(using='default'):
+    """Поисковый индекс базы using или None, если её движок
+    не поддерживается.
+    """
+    connection = connections[using]
+    index = INDEXES.get(connection.vendor)
+    return index(connection) if index is not None else None
+
+
+def index_post(post):
+    index = get_index(post._state.db or 'default')
+    if index is not None:
+        index.save([post_entry(post.pk, post.title, post.subtitle,
+                               post.text)])
+
+
+def index_comment(comment):
+    index = get_index(comment._state.db or 'default')
+    if index is not None:
+        index.save([comment_entry(comment.pk, comment.post_id,
+                                  comment.text)])
+
+
+def unindex(obj, comment=False):
+    index = get_index(obj._state.db or 'default')
+    if index is not None:
+        index.delete([obj.pk * 2 + int(comment)])
+
+
+def rebuild(post_model, comment_model, using='default', batch_size=1000):
+    """Заново заполняет индекс всеми постами и комментариями.
+    Модели передаются явно, чтобы функцию могли вызывать миграции.
+    """
+    index = get_index(using)
+    if index is None:
+        return 0
+    index.create()
+    index.clear()
+    total = 0
+    sources = (
+        (post_model, ('pk', 'title', 'subtitle', 'text'), post_entry),
+        (comment_model, ('pk', 'post_id', 'text'), comment_entry),
+    )
+    for model, fields, entry in sources:
+        batch = []
+        rows = model.objects.using(using).order_by().values_list(*fields)
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(entry(*row))
+            if len(batch) >= batch_size:
+                index.save(batch)
+                total += len(batch)
+                batch = []
+        index.save(batch)
+        total += len(batch)
+    return total
+
+
+class SearchResults:
+    """Посты, найденные по запросу query, от более к менее
+    подходящим; срез загружает только посты нужной страницы.
+    Подходит для django.core.paginator.Paginator.
+    """
+
+    def __init__(self, queryset, query):
+        self.queryset = queryset
+        self.index = get_index(queryset.db)
+        self.match = self.index.match(query) if self.index else None
+
+    def count(self):
+        if self.match is None:
+            return 0
+        return self.index.count(self.match)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if self.match is None:
+            return []
+        start = key.start or 0
+        post_ids = self.index.search(self.match, start, key.stop - start)
+        posts = self.queryset.in_bulk(post_ids)
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+def filter_queryset(queryset, query):
+    """Посты или комментарии queryset, в тексте которых есть все слова
+    query. Возвращает None, если движок БД не поддерживается.
+    """
+    index = get_index(queryset.db)
+    if index is None:
+        return None
+    match = index.match(query)
+    if match is None:
+        return queryset.none()
+    sql, params = index.matching(
+        match, comments=queryset.model._meta.model_name == 'comment')
+    return queryset.filter(pk__in=RawSQL(sql, params))
@@ -0,0 +1,164 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import feeds, search, thumbnails
+from .cache import invalidate_feeds, invalidate_post_cards
+from .models import (Comment, Follow, Group, ImageBlob, Like, Post, Profile,
+                     User)
+
+BATCH_SIZE = 1000
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно изменяет счётчик field у объектов queryset.
+
+    Уменьшение не опускает счётчик ниже нуля: расхождения исправляет
+    команда rebuild_counters.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_post_counter(post_id, field, delta):
+    change_counter(Post.objects.filter(pk=post_id), field, delta)
+
+
+def change_profile_counter(user_id, field, delta):
+    change_counter(Profile.objects.filter(user_id=user_id), field, delta)
+
+
+def move_counter(change, field, instance, attname, created):
+    """Увеличивает счётчик связанного объекта при создании instance,
+    а при смене связи (например, в админке) переносит единицу счётчика
+    со старого объекта на новый.
+    """
+    new_id = getattr(instance, attname)
+    if created:
+        change(new_id, field, 1)
+        return
+    old_id = instance.loaded_value(attname)
+    if old_id is not None and old_id != new_id:
+        change(old_id, field, -1)
+        change(new_id, field, 1)
+
+
+def change_image_references(name, delta):
+    """Изменяет число постов, ссылающихся на файл картинки name."""
+    if not name:
+        return
+    if delta > 0:
+        ImageBlob.objects.get_or_create(name=name)
+    change_counter(ImageBlob.objects.filter(name=name), 'references', delta)
+
+
+def invalidate_cards_of(posts):
+    """Сбрасывает карточки всех постов из QuerySet posts пачками."""
+    post_ids = []
+    for post_id in posts.values_list('pk', flat=True).iterator():
+        post_ids.append(post_id)
+        if len(post_ids) >= BATCH_SIZE:
+            invalidate_post_cards(post_ids)
+            post_ids = []
+    invalidate_post_cards(post_ids)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+    elif not created and (update_fields is None
+                          or 'username' in update_fields):
+        # В карточках выводится имя автора
+        invalidate_cards_of(instance.posts.all())
+        invalidate_feeds()
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    invalidate_cards_of(instance.posts.all())
+    invalidate_feeds()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if not raw:
+        move_counter(change_profile_counter, 'posts_count',
+                     instance, 'author_id', created)
+        if created:
+            feeds.fan_out(instance)
+        else:
+            feeds.update_post(instance)
+        if thumbnails.image_changed(instance):
+            old_image = str(instance.loaded_value('image') or '')
+            change_image_references(old_image, -1)
+            change_image_references(instance.image.name, 1)
+            thumbnails.index.forget([old_image])
+            transaction.on_commit(lambda: thumbnails.schedule(instance))
+    search.index_post(instance)
+    invalidate_post_cards([instance.pk])
+    invalidate_feeds()
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_profile_counter(instance.author_id, 'posts_count', -1)
+    if instance.image:
+        change_image_references(instance.image.name, -1)
+        thumbnails.index.forget([instance.image.name])
+    search.unindex(instance)
+    invalidate_post_cards([instance.pk])
+    invalidate_feeds()
+
+
+@receiver(post_save, sender=Like)
+def like_saved(sender, instance, created, raw, **kwargs):
+    if not raw:
+        move_counter(change_post_counter, 'likes_count',
+                     instance, 'post_id', created)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    change_post_counter(instance.post_id, 'likes_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    if not raw:
+        move_counter(change_post_counter, 'comments_count',
+                     instance, 'post_id', created)
+    search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    change_post_counter(instance.post_id, 'comments_count', -1)
+    search.unindex(instance, comment=True)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw, **kwargs):
+    if not raw:
+        move_counter(change_profile_counter, 'followers_count',
+                     instance, 'author_id', created)
+        move_counter(change_profile_counter, 'following_count',
+                     instance, 'user_id', created)
+        old_user_id = instance.loaded_value('user_id')
+        old_author_id = instance.loaded_value('author_id')
+        if not created and (old_user_id, old_author_id) != (
+                instance.user_id, instance.author_id):
+            feeds.trim(old_user_id, old_author_id)
+        feeds.backfill(instance.user_id, instance.author_id)
+    invalidate_feeds()
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_profile_counter(instance.author_id, 'followers_count', -1)
+    change_profile_counter(instance.user_id, 'following_count', -1)
+    feeds.trim(instance.user_id, instance.author_id)
+    invalidate_feeds()
@@ -0,0 +1,25 @@
+// Следующие комментарии подгружаются без перезагрузки страницы: ссылка
+// «Показать ещё» заменяется фрагментом со следующей страницей
+// комментариев и новой ссылкой. Если запрос не удался, браузер просто
+// переходит по ссылке.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('a[data-more-comments]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.dataset.moreComments, {
+    credentials: 'same-origin',
+    headers: {'X-Requested-With': 'XMLHttpRequest'}
+  }).then(function (response) {
+    if (!response.ok) {
+      throw new Error(response.statusText);
+    }
+    return response.text();
+  }).then(function (html) {
+    link.insertAdjacentHTML('afterend', html);
+    link.remove();
+  }).catch(function () {
+    window.location = link.href;
+  });
+});
@@ -0,0 +1,40 @@
+// Лайки и подписки без перезагрузки страницы: ссылка с data-action
+// запрашивается с Accept: application/json, а ответ обновляет кнопку
+// и счётчик. Если ответ не JSON (например, нужно войти), браузер
+// просто переходит по ссылке.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('a[data-action]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.href, {
+    credentials: 'same-origin',
+    headers: {
+      'Accept': 'application/json',
+      'X-Requested-With': 'XMLHttpRequest'
+    }
+  }).then(function (response) {
+    var type = response.headers.get('Content-Type') || '';
+    if (!response.ok || type.indexOf('application/json') === -1) {
+      throw new Error(response.statusText);
+    }
+    return response.json();
+  }).then(function (data) {
+    if (link.dataset.action === 'like') {
+      link.classList.toggle('solid', data.liked);
+      link.title = data.liked ? 'Убрать лайк' : 'Нравится';
+      link.textContent = data.likes_count;
+    } else if (link.dataset.action === 'follow') {
+      link.href = data.following ? link.dataset.unfollowUrl
+                                 : link.dataset.followUrl;
+      link.textContent = data.following ? 'Отписаться' : 'Подписаться';
+      var counter = document.querySelector('[data-followers-count]');
+      if (counter) {
+        counter.textContent = data.followers_count;
+      }
+    }
+  }).catch(function () {
+    window.location = link.href;
+  });
+});
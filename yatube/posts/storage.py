@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.utils.crypto import get_random_string
+from django.utils.deconstruct import deconstructible
+
+
+def content_digest(content):
+    """sha256 содержимого файла. Загрузки, принятые
+    posts.uploads.ImageUploadHandler, уже посчитаны при получении.
+    """
+    digest = getattr(content, 'sha256', None)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        digest = sha256.hexdigest()
+        content.seek(0)
+    return digest
+
+
+@deconstructible
+class DeduplicatingStorage(FileSystemStorage):
+    """Хранит каждое содержимое один раз: по sha256 загруженного файла
+    ищется ImageBlob, и повторная загрузка той же картинки получает имя
+    уже сохранённого файла, поэтому заново не записывается и использует
+    уже созданные миниатюры. Первая копия сохраняется под обычным
+    именем, так что адреса картинок не меняются.
+
+    Digest считается по загруженным байтам, поэтому после удаления EXIF
+    (posts.thumbnails.strip_metadata) повторная загрузка исходного
+    файла всё так же находит уже обработанную картинку.
+
+    Имена удалённых файлов остаются в ImageBlob без digest и повторно
+    не выдаются: индекс миниатюр (posts.thumbnails.ThumbnailIndex)
+    других процессов помнит картинки по имени.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        ImageBlob = apps.get_model('posts', 'ImageBlob')
+        while True:
+            name = super().get_available_name(name, max_length)
+            if not ImageBlob.objects.filter(name=name).exists():
+                return name
+            directory, file_name = os.path.split(name)
+            file_root, file_ext = os.path.splitext(file_name)
+            name = os.path.join(
+                directory, f'{file_root}_{get_random_string(7)}{file_ext}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        ImageBlob = apps.get_model('posts', 'ImageBlob')
+        digest = content_digest(content)
+        blob = ImageBlob.objects.filter(digest=digest).first()
+        if blob is not None:
+            if self.exists(blob.name):
+                # Свежая дата изменения не даёт сборщику мусора удалить
+                # файл, пока новый пост со ссылкой на него ещё не сохранён
+                os.utime(self.path(blob.name))
+                return blob.name
+            ImageBlob.objects.filter(pk=blob.pk).update(digest=None)
+        name = super().save(name, content, max_length)
+        try:
+            with transaction.atomic():
+                ImageBlob.objects.create(digest=digest, name=name)
+        except IntegrityError:
+            other = ImageBlob.objects.filter(digest=digest).first()
+            if other is None:
+                # Имя одновременно занял другой запрос
+                self.delete(name)
+                return self.save(name, content, max_length)
+            # Тот же файл одновременно сохранил другой запрос
+            self.delete(name)
+            return other.name
+        return name
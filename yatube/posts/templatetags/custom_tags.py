@@ -1,5 +1,11 @@
 from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.safestring import mark_safe
+from posts.cache import post_card_key
+from posts.thumbnails import resolve
 
 register = template.Library()
 
@@ -7,3 +13,26 @@ register = template.Library()
 @register.simple_tag
 def anchor(url_name, section_id):
     return reverse(url_name) + '#' + section_id
+
+
+@register.simple_tag
+def post_card(post):
+    """Заголовок, картинка и текст поста. Не зависят от пользователя,
+    поэтому хранятся в кэше и сбрасываются сигналами posts.signals.
+    Миниатюра и варианты картинки только ищутся среди готовых (обычно
+    их заранее находит для всей страницы posts.thumbnails.resolve),
+    создаёт их posts.thumbnails в фоне.
+    """
+    key = post_card_key(post.pk)
+    html = cache.get(key)
+    if html is None:
+        if not hasattr(post, 'thumbnail'):
+            resolve([post])
+        thumbnail = getattr(post, 'thumbnail', None)
+        html = render_to_string('includes/post_card.html', {
+            'post': post, 'thumbnail': thumbnail,
+            'sources': getattr(post, 'picture_sources', [])})
+        # Карточку с заглушкой вместо картинки не кэшируем
+        if thumbnail is not None or not post.image:
+            cache.set(key, html, settings.POST_CARD_CACHE_TIMEOUT)
+    return mark_safe(html)
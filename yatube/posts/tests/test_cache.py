@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from posts.cache import page_cache_key, page_cache_stats, record_page_cache
+from posts.models import Group, Post, User
+from posts.tests.utils import TestCase
+
+
+class PostCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='John')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group-slug',
+            description='Тестовое описание'
+        )
+        self.post = Post.objects.create(
+            text='Тестовый текст', author=self.author, group=self.group)
+        self.guest_client = Client()
+        self.post_author_client = Client()
+        self.post_author_client.force_login(self.author)
+
+    def get_index(self, client=None):
+        client = client or self.guest_client
+        return client.get(reverse('index')).content.decode()
+
+    def test_card_is_shared_between_users(self):
+        """Карточка берётся из кэша, а ссылка на редактирование
+        показывается только автору.
+        """
+        self.get_index()
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        edit_url = reverse('post_edit',
+                           args=(self.author.username, self.post.pk))
+
+        guest_page = self.get_index()
+        author_page = self.get_index(self.post_author_client)
+        self.assertIn('Тестовый текст', guest_page)
+        self.assertIn('Тестовый текст', author_page)
+        self.assertNotIn(edit_url, guest_page)
+        self.assertIn(edit_url, author_page)
+
+    def test_post_save_invalidates_card(self):
+        """Сохранение поста сбрасывает его карточку."""
+        self.get_index()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertIn('Новый текст', self.get_index())
+
+    def test_group_save_invalidates_cards(self):
+        """Сохранение группы сбрасывает карточки её постов."""
+        self.get_index()
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertIn('#Новое название', self.get_index())
+
+
+class AnonymousPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='John')
+        self.post = Post.objects.create(text='Тестовый текст',
+                                        author=self.author)
+        self.guest_client = Client()
+        self.url = reverse('index')
+
+    def test_anonymous_page_is_cached(self):
+        """Повторный анонимный запрос отдаётся из кэша."""
+        first = self.guest_client.get(self.url)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        second = self.guest_client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(page_cache_stats(),
+                         {'hit': 1, 'stale': 0, 'miss': 1})
+
+    def test_stats_are_one_cache_write_per_response(self):
+        """Существующий счётчик увеличивается одним incr, без add."""
+        record_page_cache('hit')
+        with mock.patch.object(cache, 'add') as add:
+            record_page_cache('hit')
+        add.assert_not_called()
+        self.assertEqual(page_cache_stats()['hit'], 2)
+
+    def test_authorized_page_is_not_cached(self):
+        """Страницы для авторизованных пользователей не кэшируются."""
+        client = Client()
+        client.force_login(self.author)
+        client.get(self.url)
+        self.assertNotIn('X-Cache', client.get(self.url))
+
+    def test_new_post_refreshes_page(self):
+        """Новый пост меняет версию, и страница пересобирается."""
+        self.guest_client.get(self.url)
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Новый пост', response.content.decode())
+
+    def test_stale_page_served_while_another_request_refreshes(self):
+        """Пока страницу пересобирает другой запрос, отдаётся устаревшая."""
+        self.guest_client.get(self.url)
+        Post.objects.create(text='Новый пост', author=self.author)
+        lock_key = page_cache_key(RequestFactory().get(self.url)) + ':lock'
+        cache.add(lock_key, 1)
+
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertNotIn('Новый пост', response.content.decode())
+
+    @override_settings(PAGE_CACHE_LOCK_WAIT=0.1)
+    def test_cold_miss_waits_for_lock_holder(self):
+        """Без записи в кэше запрос ждёт пересборки другим запросом,
+        а не дождавшись -- собирает страницу сам.
+        """
+        lock_key = page_cache_key(RequestFactory().get(self.url)) + ':lock'
+        cache.add(lock_key, 1)
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Тестовый текст', response.content.decode())
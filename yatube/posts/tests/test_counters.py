@@ -0,0 +1,102 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import Client
+from django.urls import reverse
+from posts.models import Comment, Follow, Like, Post, Profile, User
+from posts.tests.utils import TestCase
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='John')
+        self.user = User.objects.create_user(username='Jane')
+        self.post = Post.objects.create(text='Тестовый текст',
+                                        author=self.author)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertCounters(self, obj, **expected):
+        obj.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_profile_is_created_for_new_user(self):
+        """Для нового пользователя создаётся профиль со счётчиками."""
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+
+    def test_pages_of_user_without_profile(self):
+        """Страницы автора без профиля (например, из loaddata)
+        открываются с нулевыми счётчиками.
+        """
+        Profile.objects.filter(user=self.author).delete()
+        for url in (reverse('profile', args=(self.author.username,)),
+                    reverse('post', args=(self.author.username,
+                                          self.post.pk))):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['posts_count'], 0)
+                self.assertEqual(response.context['followed_by'], 0)
+
+    def test_like_toggles_likes_count(self):
+        """Лайк и его отмена меняют likes_count поста."""
+        url = reverse('like', args=(self.author.username, self.post.id))
+        self.authorized_client.get(url)
+        self.assertCounters(self.post, likes_count=1)
+        self.authorized_client.get(url)
+        self.assertCounters(self.post, likes_count=0)
+
+    def test_add_comment_increments_comments_count(self):
+        """Новый комментарий увеличивает comments_count поста."""
+        self.authorized_client.post(
+            reverse('add_comment', args=(self.author.username, self.post.id)),
+            {'text': 'Комментарий'}
+        )
+        self.assertCounters(self.post, comments_count=1)
+        Comment.objects.get(post=self.post).delete()
+        self.assertCounters(self.post, comments_count=0)
+
+    def test_follow_and_unfollow_change_profile_counters(self):
+        """Подписка и отписка меняют счётчики обоих профилей."""
+        self.authorized_client.get(
+            reverse('profile_follow', args=(self.author.username,)))
+        self.assertCounters(self.author.profile, followers_count=1)
+        self.assertCounters(self.user.profile, following_count=1)
+        self.authorized_client.get(
+            reverse('profile_unfollow', args=(self.author.username,)))
+        self.assertCounters(self.author.profile, followers_count=0)
+        self.assertCounters(self.user.profile, following_count=0)
+
+    def test_post_create_delete_and_author_change(self):
+        """posts_count следует за созданием, удалением и сменой автора."""
+        self.assertCounters(self.author.profile, posts_count=1)
+        self.post.author = self.user
+        self.post.save()
+        self.assertCounters(self.author.profile, posts_count=0)
+        self.assertCounters(self.user.profile, posts_count=1)
+        self.post.delete()
+        self.assertCounters(self.user.profile, posts_count=0)
+
+    def test_deleting_user_keeps_counters_consistent(self):
+        """Каскадное удаление пользователя не ломает чужие счётчики."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Like.objects.create(user=self.user, post=self.post)
+        self.user.delete()
+        self.assertCounters(self.author.profile, followers_count=0)
+        self.assertCounters(self.post, likes_count=0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters находит и исправляет расхождения."""
+        Like.objects.create(user=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=5)
+        Profile.objects.filter(user=self.author).delete()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_counters', '--check', stdout=StringIO())
+
+        self.assertCounters(self.post, likes_count=1)
+        self.assertEqual(Profile.objects.get(user=self.author).posts_count, 1)
@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import FeedEntry, Follow, Post, User
+from posts.tests.utils import TestCase
+
+
+class FollowFeedTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='John')
+        self.user = User.objects.create_user(username='Jane')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_feed(self):
+        response = self.authorized_client.get(reverse('follow_index'))
+        return list(response.context.get('page').object_list)
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает во входящую ленту подписчика."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists())
+        self.assertEqual(self.get_feed(), [post])
+
+    def test_follow_backfills_and_unfollow_trims_feed(self):
+        """Подписка добавляет старые посты автора, отписка убирает их."""
+        posts = [Post.objects.create(text=f'Пост {i}', author=self.author)
+                 for i in range(3)]
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.get_feed(), posts[::-1])
+        follow.delete()
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_pulled_on_read(self):
+        """Посты популярных авторов не раскладываются при записи,
+        а подтягиваются при чтении ленты.
+        """
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.get_feed(), [post])
+
+    def test_feed_is_read_without_follow_join(self):
+        """Лента подписок читается из входящих без соединения с Follow."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(text='Тестовый текст', author=self.author)
+        with CaptureQueriesContext(connection) as context:
+            self.get_feed()
+        feed_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'posts_feedentry' in query['sql']
+            and 'LIMIT' in query['sql']
+        ]
+        self.assertTrue(feed_queries)
+        for sql in feed_queries:
+            self.assertNotIn('posts_follow', sql)
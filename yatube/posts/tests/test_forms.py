@@ -3,10 +3,11 @@ import tempfile
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import Client, override_settings
 from django.urls import reverse
 from posts.forms import CommentForm, PostForm
 from posts.models import Comment, Group, Post, User
+from posts.tests.utils import TestCase
 
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.MEDIA_ROOT))
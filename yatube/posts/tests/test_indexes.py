@@ -0,0 +1,76 @@
+from unittest import skipUnless
+
+from django.db import connection
+from posts.models import FeedEntry, Follow, Group, Like, Post, User
+from posts.paginators import CursorPaginator
+from posts.tests.utils import TestCase
+
+
+class IndexUsageTest(TestCase):
+    """Запросы лент используют составные индексы (проверка по EXPLAIN)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='John')
+        cls.user = User.objects.create_user(username='Jane')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group-slug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author, group=cls.group)
+
+    def get_queries(self):
+        post = IndexUsageTest.post
+        return {
+            'post_date_idx': Post.objects.for_feed()[:5],
+            'post_author_date_idx':
+                IndexUsageTest.author.posts.for_feed()[:5],
+            'post_group_date_idx': IndexUsageTest.group.posts.for_feed()[:5],
+            'feed_entry_user_date_idx': FeedEntry.objects.filter(
+                user=IndexUsageTest.user).order_by('-pub_date',
+                                                   '-post_id')[:5],
+            'comment_post_created_idx':
+                post.comments.order_by('-created', '-id')[:5],
+            'follow_author_user_idx': Follow.objects.filter(
+                author=IndexUsageTest.author).values('user_id'),
+            'like_post_user_idx': Like.objects.filter(
+                post=post).values('user_id'),
+        }
+
+    def explain(self, queryset, prefix):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(str(row) for row in cursor.fetchall())
+
+    @skipUnless(connection.vendor == 'sqlite', 'Только для SQLite')
+    def test_sqlite_uses_indexes(self):
+        for index, queryset in self.get_queries().items():
+            with self.subTest(index=index):
+                plan = self.explain(queryset, 'EXPLAIN QUERY PLAN ')
+                self.assertIn(index, plan)
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Только для SQLite')
+    def test_sqlite_cursor_page_seeks_index(self):
+        """Курсорная страница начинает обход индекса с курсора."""
+        post = IndexUsageTest.post
+        paginator = CursorPaginator(Post.objects.for_feed(), 5)
+        queryset = Post.objects.for_feed().filter(
+            paginator._after([post.pub_date, post.id], paginator.keys))[:5]
+        plan = self.explain(queryset, 'EXPLAIN QUERY PLAN ')
+        self.assertIn('SEARCH', plan)
+        self.assertIn('post_date_idx', plan)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Только для PostgreSQL')
+    def test_postgresql_uses_indexes(self):
+        with connection.cursor() as cursor:
+            # На маленькой таблице планировщик предпочёл бы полный проход
+            cursor.execute('SET enable_seqscan = off')
+        for index, queryset in self.get_queries().items():
+            with self.subTest(index=index):
+                self.assertIn(index, self.explain(queryset, 'EXPLAIN '))
@@ -0,0 +1,153 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import likes
+from posts.models import Like, Post, User
+from posts.tests.utils import TestCase
+
+
+@override_settings(LIKES_WRITE_BEHIND=True, LIKES_FLUSH_SIZE=100)
+class WriteBehindLikesTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        log = override_settings(
+            LIKES_LOG_PATH=os.path.join(directory, 'likes.log'))
+        log.enable()
+        self.addCleanup(log.disable)
+        self.author = User.objects.create_user(username='John')
+        self.user = User.objects.create_user(username='Jane')
+        self.posts = [Post.objects.create(text=f'Пост {number}',
+                                          author=self.author)
+                      for number in range(3)]
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def like(self, post):
+        response = self.client.get(
+            reverse('like', args=(self.author.username, post.pk)),
+            HTTP_ACCEPT='application/json')
+        return response.json()
+
+    def page(self):
+        return {post.pk: post
+                for post in self.client.get(reverse('index')).context['page']}
+
+    def test_likes_are_queued_and_visible_to_user(self):
+        post = self.posts[0]
+        self.assertEqual(self.like(post), {'liked': True, 'likes_count': 1})
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(likes.queue_depth(), 1)
+
+        page = self.page()
+        self.assertTrue(page[post.pk].liked)
+        self.assertEqual(page[post.pk].likes_count, 1)
+        self.assertEqual(self.like(post), {'liked': False, 'likes_count': 0})
+        self.assertFalse(self.page()[post.pk].liked)
+
+    def test_enqueue_does_not_write_to_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            likes.enqueue(self.user.pk, self.posts[0].pk)
+            likes.enqueue(self.user.pk, self.posts[1].pk)
+        self.assertEqual(
+            [query['sql'] for query in queries
+             if not query['sql'].startswith('SELECT')
+             or 'COUNT(' in query['sql']],
+            [])
+        self.assertEqual(likes.queue_depth(), 2)
+
+    def test_flush_writes_last_intent(self):
+        first, second, third = self.posts
+        Like.objects.create(user=self.user, post=third)
+        self.like(first)
+        self.like(second)
+        self.like(second)
+        self.like(third)
+
+        # Второй пост переключён дважды, то есть не изменился
+        self.assertEqual(likes.flush(batch_size=1), 2)
+        self.assertEqual(likes.queue_depth(), 0)
+        self.assertEqual(
+            list(Like.objects.values_list('post_id', flat=True)), [first.pk])
+        counts = dict(Post.objects.values_list('pk', 'likes_count'))
+        self.assertEqual(counts, {first.pk: 1, second.pk: 0, third.pk: 0})
+        page = self.page()
+        self.assertEqual([page[post.pk].liked for post in self.posts],
+                         [True, False, False])
+        self.assertEqual([page[post.pk].likes_count for post in self.posts],
+                         [1, 0, 0])
+
+    def test_full_queue_is_flushed_by_request(self):
+        with override_settings(LIKES_FLUSH_SIZE=3):
+            for post in self.posts:
+                self.like(post)
+        self.assertEqual(Like.objects.count(), 3)
+        self.assertEqual(likes.queue_depth(), 0)
+
+    def test_queue_survives_cache_eviction(self):
+        """Очередь не хранится в кэше: вытеснение записей кэша между
+        лайком и записью очереди ничего не теряет.
+        """
+        post = self.posts[0]
+        self.like(post)
+        for number in range(400):
+            cache.set(f'filler:{number}', number)
+        self.assertEqual(likes.queue_depth(), 1)
+        self.assertEqual(self.page()[post.pk].likes_count, 1)
+        self.assertEqual(likes.flush(), 1)
+        self.assertTrue(Like.objects.filter(user=self.user,
+                                            post=post).exists())
+        self.assertEqual(self.page()[post.pk].likes_count, 1)
+        self.assertEqual(self.like(post), {'liked': False, 'likes_count': 0})
+
+    def test_concurrent_toggles_are_not_lost(self):
+        """Два одновременных клика -- два переключения, даже если оба
+        запроса видели лайк неснятым.
+        """
+        post = self.posts[0]
+        likes.append(likes.TOGGLE.pack(self.user.pk, post.pk))
+        self.assertEqual(self.like(post), {'liked': False, 'likes_count': 0})
+        self.assertEqual(likes.flush(), 0)
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(Post.objects.get(pk=post.pk).likes_count, 0)
+
+    def test_flush_counts_only_inserted_likes(self):
+        """Лайк, который уже есть в Like, например после прерванной
+        записи очереди, не увеличивает счётчик второй раз.
+        """
+        post = self.posts[0]
+        self.like(post)
+        likes.prepare(batch_size=100)
+        likes.apply_intents(batch_size=100)
+        with open(likes.log_path(likes.INTENTS), 'wb') as file:
+            file.write(likes.INTENT.pack(self.user.pk, post.pk, True))
+        self.assertEqual(likes.flush(), 1)
+        self.assertEqual(Like.objects.count(), 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).likes_count, 1)
+
+    def test_flush_is_exclusive_across_processes(self):
+        self.like(self.posts[0])
+        fd = os.open(likes.log_path(likes.LOCK), os.O_RDWR | os.O_CREAT)
+        try:
+            likes.fcntl.flock(fd, likes.fcntl.LOCK_EX)
+            self.assertEqual(likes.flush(), 0)
+        finally:
+            os.close(fd)
+        self.assertEqual(likes.flush(), 1)
+
+    def test_command_reports_depth(self):
+        self.like(self.posts[0])
+        out = io.StringIO()
+        call_command('flush_likes', '--depth', stdout=out)
+        self.assertEqual(out.getvalue().strip(), '1')
+        call_command('flush_likes', stdout=io.StringIO())
+        self.assertEqual(likes.queue_depth(), 0)
+        self.assertEqual(Like.objects.count(), 1)
@@ -0,0 +1,133 @@
+import os
+
+from django.conf import settings
+from django.test import override_settings
+from posts import thumbnails
+from posts.counters import rebuild_counters
+from posts.media_gc import MediaCollector
+from posts.models import ImageBlob, ImageVariant, Post, User
+from posts.tests.utils import (TEST_GIF, TemporaryMediaMixin, TestCase,
+                               make_image)
+
+
+def media_files():
+    files = set()
+    for directory, _, names in os.walk(settings.MEDIA_ROOT):
+        for name in names:
+            files.add(os.path.relpath(os.path.join(directory, name),
+                                      settings.MEDIA_ROOT))
+    return files
+
+
+@override_settings(THUMBNAIL_ASYNC=False)
+class MediaCollectorTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='John')
+        self.kept = Post.objects.create(
+            text='Картинка на месте', author=author, image=make_image('a.gif'))
+        thumbnails.schedule(self.kept)
+
+        self.edited = Post.objects.create(
+            text='Картинку заменили', author=author, image=make_image('b.gif'))
+        thumbnails.schedule(self.edited)
+        self.replaced = self.edited.image.name
+        self.edited.image = make_image('c.gif')
+        self.edited.save()
+        thumbnails.schedule(self.edited)
+
+        deleted = Post.objects.create(
+            text='Пост удалили', author=author, image=make_image('d.gif'))
+        thumbnails.schedule(deleted)
+        self.deleted = deleted.image.name
+        deleted.delete()
+
+        self.live_files = self.files_of(self.kept.image.name,
+                                        self.edited.image.name)
+        self.orphan_files = self.files_of(self.replaced, self.deleted)
+
+    def files_of(self, *names):
+        files = set(names)
+        for name in names:
+            image = Post(image=name).image
+            files.add(thumbnails.lookup(image, 'card').name)
+            files.update(ImageVariant.objects.filter(
+                source=name).values_list('image', flat=True))
+        return files
+
+    def assert_collected(self):
+        files = media_files()
+        self.assertTrue(self.live_files <= files)
+        self.assertFalse(self.orphan_files & files)
+        self.assertFalse(ImageVariant.objects.filter(
+            source__in=[self.replaced, self.deleted]).exists())
+        self.assertIsNotNone(thumbnails.lookup(self.kept.image, 'card'))
+
+    def test_orphans_are_deleted(self):
+        """Удаляются замененные и оставшиеся от удалённых постов
+        картинки вместе с миниатюрами и вариантами.
+        """
+        self.assertTrue(MediaCollector(min_age=0).run())
+        self.assert_collected()
+
+    def test_dry_run_deletes_nothing(self):
+        files = media_files()
+        collector = MediaCollector(dry_run=True, min_age=0)
+        self.assertTrue(collector.run())
+        self.assertEqual(media_files(), files)
+        # Две картинки и их варианты; миниатюры станут ничейными только
+        # после удаления записей sorl-thumbnail
+        self.assertEqual(collector.stats['ничейных файлов'], 6)
+        self.assertEqual(collector.stats['записей ImageVariant'], 4)
+
+    def test_young_files_are_kept(self):
+        MediaCollector(min_age=3600).run()
+        self.assertTrue(self.orphan_files - {self.replaced, self.deleted}
+                        <= media_files())
+        self.assertTrue({self.replaced, self.deleted} <= media_files())
+
+    def test_resume_after_time_budget(self):
+        """Работа, остановленная по времени, продолжается с того места,
+        где остановилась.
+        """
+        state = None
+        for _ in range(100):
+            collector = MediaCollector(time_budget=0, min_age=0,
+                                       batch_size=1, state=state)
+            if collector.run():
+                break
+            self.assertIsNotNone(collector.state['stage'])
+            state = collector.state
+        else:
+            self.fail('Сборка мусора не завершилась')
+        self.assert_collected()
+
+    def test_names_of_deleted_files_are_not_reused(self):
+        """Новая картинка не получает имя файла, удалённого сборщиком
+        мусора, даже с тем же именем при загрузке.
+        """
+        MediaCollector(min_age=0).run()
+        self.assertTrue(ImageBlob.objects.filter(
+            name=self.deleted, digest=None).exists())
+        post = Post.objects.create(
+            text='Новая картинка', author=self.kept.author,
+            image=make_image('d.gif', content=TEST_GIF + b'new'))
+        self.assertNotEqual(post.image.name, self.deleted)
+        self.assertTrue(post.image.name.startswith('posts/d_'))
+
+    def test_liveness_follows_references(self):
+        """Картинка со ссылками по ImageBlob.references не удаляется,
+        даже если пост потерял её в обход сигналов; после пересчёта
+        счётчиков она становится мусором. Картинка поста с нулевым
+        счётчиком остаётся на месте.
+        """
+        Post.objects.filter(pk=self.edited.pk).update(image='')
+        ImageBlob.objects.filter(name=self.kept.image.name).update(
+            references=0)
+        MediaCollector(min_age=0).run()
+        self.assertTrue(self.live_files <= media_files())
+
+        rebuild_counters(ImageBlob)
+        MediaCollector(min_age=0).run()
+        files = media_files()
+        self.assertIn(self.kept.image.name, files)
+        self.assertNotIn(self.edited.image.name, files)
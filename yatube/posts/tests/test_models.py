@@ -1,5 +1,5 @@
-from django.test import TestCase
 from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.utils import TestCase
 
 
 class PostModelTest(TestCase):
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Post, User
+from posts.paginators import CachedCountPaginator, CursorPaginator
+from posts.tests.utils import TestCase
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='John')
+        now = timezone.now()
+        # Часть постов с одинаковой датой: порядок задаёт id
+        for i in range(7):
+            Post.objects.create(
+                text=f'Тестовый текст номер {i}',
+                author=cls.author,
+                pub_date=now - timedelta(minutes=i // 3),
+            )
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def test_pages_cover_all_posts_in_order(self):
+        """Курсорные страницы по порядку содержат все посты без повторов."""
+        paginator = CursorPaginator(Post.objects.all(), 3)
+        page = paginator.get_page()
+        posts = list(page)
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            posts.extend(page)
+        self.assertEqual(posts, CursorPaginatorTest.expected)
+        self.assertFalse(page.has_next())
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор previous возвращает предыдущую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 3)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        self.assertFalse(first.has_previous())
+        self.assertEqual(
+            list(paginator.get_page(second.previous_cursor)), list(first))
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор приводит к первой странице."""
+        paginator = CursorPaginator(Post.objects.all(), 3)
+        for cursor in ('garbage', 'WyJuZXh0Il0', '!!!'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(list(paginator.get_page(cursor)),
+                                 CursorPaginatorTest.expected[:3])
+
+    def test_feed_views_accept_cursor(self):
+        """Ленты принимают ?cursor=, а ?page=N продолжает работать."""
+        client = Client()
+        url = reverse('index')
+        with override_settings(PAGINATOR_PER_PAGE=3,
+                               FEED_PAGINATION='cursor'):
+            page = client.get(url).context['page']
+            next_page = client.get(
+                url, {'cursor': page.next_cursor}).context['page']
+            numbered = client.get(url, {'page': 2}).context['page']
+        self.assertEqual(list(next_page), CursorPaginatorTest.expected[3:6])
+        self.assertEqual(list(numbered.object_list),
+                         CursorPaginatorTest.expected[3:6])
+
+
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='John')
+        for i in range(30):
+            Post.objects.create(text=f'Тестовый текст номер {i}',
+                                author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached_until_post_saved(self):
+        """Число постов берётся из кэша, пока не сохранён новый пост."""
+        self.assertEqual(CachedCountPaginator(Post.objects.all(), 5).count,
+                         30)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                CachedCountPaginator(Post.objects.all(), 5).count, 30)
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(CachedCountPaginator(Post.objects.all(), 5).count,
+                         31)
+
+    @override_settings(PAGINATOR_COUNT_THRESHOLD=10)
+    def test_count_above_threshold_without_estimate_is_exact(self):
+        """Если БД не даёт оценки, число считается точно и все страницы
+        доступны.
+        """
+        paginator = CachedCountPaginator(Post.objects.all(), 5)
+        self.assertEqual(paginator.count, 30)
+        self.assertFalse(paginator.count_is_estimated)
+        page = paginator.get_page(6)
+        self.assertEqual(page.number, 6)
+        self.assertFalse(page.has_next())
+
+    @override_settings(PAGINATOR_COUNT_THRESHOLD=10)
+    def test_estimated_count_does_not_limit_pages(self):
+        """С заниженной оценкой страницы за ней доступны, а наличие
+        следующей страницы определяется по лишнему объекту.
+        """
+        expected = list(Post.objects.all())
+        with mock.patch('posts.paginators.estimate_count', return_value=10):
+            paginator = CachedCountPaginator(Post.objects.all(), 5)
+            self.assertEqual(paginator.count, 10)
+            self.assertTrue(paginator.count_is_estimated)
+            page = paginator.get_page(5)
+            self.assertEqual(list(page), expected[20:25])
+            self.assertTrue(page.has_next())
+            page = paginator.get_page(6)
+            self.assertEqual(list(page), expected[25:])
+            self.assertFalse(page.has_next())
+            self.assertEqual(paginator.get_page(9).number, 1)
+
+    @override_settings(PAGINATOR_WINDOW=1)
+    def test_page_window(self):
+        """Диапазон страниц ограничен окном вокруг текущей страницы."""
+        paginator = CachedCountPaginator(Post.objects.all(), 2)
+        windows = {
+            1: [1, 2, None, 15],
+            3: [1, 2, 3, 4, None, 15],
+            8: [1, None, 7, 8, 9, None, 15],
+            15: [1, None, 14, 15],
+        }
+        for number, window in windows.items():
+            with self.subTest(number=number):
+                self.assertEqual(paginator.page(number).page_window,
+                                 window)
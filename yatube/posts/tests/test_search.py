@@ -0,0 +1,88 @@
+from django.contrib.admin.sites import site
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from posts import search
+from posts.models import Comment, Post, User
+from posts.tests.utils import TestCase
+
+
+class StemTest(TestCase):
+    def test_russian_words_are_stemmed(self):
+        words = {
+            'важнейшие': 'важн',
+            'постами': 'пост',
+            'подписчиков': 'подписчик',
+            'взглянула': 'взглянул',
+            'вежливость': 'вежлив',
+            'раскрывающийся': 'раскрыва',
+            'ёлки': 'елк',
+            'Django': 'django',
+        }
+        for word, stem in words.items():
+            with self.subTest(word=word):
+                self.assertEqual(search.stem(word), stem)
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='John')
+        self.in_text = Post.objects.create(
+            text='Красивые горы на закате', author=self.author)
+        self.in_comment = Post.objects.create(
+            text='Фотографии из поездки', author=self.author)
+        Comment.objects.create(post=self.in_comment, author=self.author,
+                               text='Какая красивая гора')
+        Post.objects.create(text='Про море', author=self.author)
+        for number in range(5):
+            Post.objects.create(text=f'Новости дня {number}',
+                                author=self.author)
+        self.client = Client()
+
+    def found(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        return [post.pk for post in response.context['page']]
+
+    def test_search_by_word_forms(self):
+        """Находятся посты с другими формами слов запроса, сначала те,
+        где совпал текст поста, затем -- комментарии.
+        """
+        self.assertEqual(self.found('красивая гора'),
+                         [self.in_text.pk, self.in_comment.pk])
+        self.assertEqual(self.found('закат'), [self.in_text.pk])
+        self.assertEqual(self.found('луна'), [])
+        self.assertEqual(self.found(''), [])
+
+    def test_index_follows_changes(self):
+        self.in_text.text = 'Синее море'
+        self.in_text.save()
+        self.assertEqual(self.found('закатом'), [])
+        self.assertEqual(len(self.found('морем')), 2)
+
+        self.in_comment.comments.all().delete()
+        self.assertEqual(self.found('горы'), [])
+        self.in_text.delete()
+        self.assertEqual(len(self.found('море')), 1)
+
+    def test_results_are_paginated(self):
+        Post.objects.bulk_create(
+            Post(text=f'Горный пейзаж {number}', author=self.author)
+            for number in range(12))
+        search.rebuild(Post, Comment)
+        response = self.client.get(reverse('search'),
+                                   {'q': 'горные', 'page': 3})
+        page = response.context['page']
+        self.assertEqual(page.paginator.count, 12)
+        self.assertEqual(len(page), 2)
+        self.assertContains(response, '?q=%D0%B3%D0%BE%D1%80%D0%BD%D1%8B'
+                                      '%D0%B5&amp;page=2')
+
+    def test_admin_search_uses_index(self):
+        request = RequestFactory().get('/')
+        for model, expected in ((Post, [self.in_text.pk]),
+                                (Comment, self.in_comment.comments.values_list(
+                                    'pk', flat=True))):
+            with self.subTest(model=model.__name__):
+                queryset, _ = site._registry[model].get_search_results(
+                    request, model.objects.all(), 'красивую гору')
+                self.assertEqual(list(queryset.values_list('pk', flat=True)),
+                                 list(expected))
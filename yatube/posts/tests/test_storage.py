@@ -0,0 +1,53 @@
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.test import override_settings
+from posts import thumbnails
+from posts.models import ImageBlob, Post, User
+from posts.tests.utils import (TEST_GIF, TemporaryMediaMixin, TestCase,
+                               make_image)
+
+
+@override_settings(THUMBNAIL_ASYNC=False)
+class DeduplicatingStorageTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='John')
+
+    def create_post(self, name):
+        post = Post.objects.create(text='Пост с картинкой', author=self.author,
+                                   image=make_image(name, content=TEST_GIF))
+        thumbnails.schedule(post)
+        return post
+
+    def references(self, name):
+        return ImageBlob.objects.get(name=name).references
+
+    def test_same_content_is_stored_once(self):
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, 'posts/first.gif')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(
+            os.listdir(os.path.join(settings.MEDIA_ROOT, 'posts')),
+            ['first.gif'])
+        self.assertEqual(self.references(first.image.name), 2)
+
+    def test_references_follow_posts(self):
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        first.delete()
+        self.assertEqual(self.references(second.image.name), 1)
+
+        second.image = make_image('other.gif', content=TEST_GIF + b'\0')
+        second.save()
+        self.assertEqual(self.references('posts/first.gif'), 0)
+        self.assertEqual(self.references('posts/other.gif'), 1)
+
+    def test_duplicate_reuses_thumbnails(self):
+        first = self.create_post('first.gif')
+        with mock.patch.object(thumbnails, 'make_variants') as make_variants:
+            second = self.create_post('second.gif')
+        make_variants.assert_not_called()
+        self.assertEqual(thumbnails.lookup(second.image, 'card').name,
+                         thumbnails.lookup(first.image, 'card').name)
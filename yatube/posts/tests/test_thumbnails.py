@@ -0,0 +1,157 @@
+import os
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.test import Client, TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import ImageVariant, Post, User
+from posts.tests.utils import TemporaryMediaMixin, TestCase, make_image
+
+
+@override_settings(THUMBNAIL_ASYNC=False)
+class ThumbnailPlaceholderTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='John')
+        self.client = Client()
+        self.client.force_login(self.author)
+        # В TestCase обработчики on_commit не вызываются, поэтому
+        # миниатюры сами не создаются
+        self.post = Post.objects.create(
+            text='Тестовый текст', author=self.author, image=make_image())
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, выводится заглушка, а после создания
+        миниатюры карточка обновляется.
+        """
+        page = self.client.get(reverse('index')).content.decode()
+        self.assertIn('images/placeholder.svg', page)
+        self.assertIsNone(thumbnails.lookup(self.post.image, 'card'))
+
+        thumbnails.schedule(self.post)
+
+        page = self.client.get(reverse('index')).content.decode()
+        thumbnail = thumbnails.lookup(self.post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        self.assertNotIn('images/placeholder.svg', page)
+        self.assertIn(thumbnail.url, page)
+
+
+@override_settings(THUMBNAIL_ASYNC=False,
+                   IMAGE_VARIANT_WIDTHS=(480, 960, 1440))
+class ImageVariantTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='John')
+        self.post = Post.objects.create(
+            text='Тестовый текст', author=self.author,
+            image=make_image('big.png', size=(1200, 600)))
+        thumbnails.schedule(self.post)
+
+    def test_variants_are_created(self):
+        """Варианты создаются для ширин не больше исходной картинки
+        и для каждого поддерживаемого формата.
+        """
+        variants = ImageVariant.objects.filter(source=self.post.image.name)
+        formats = {mime_type for _, mime_type, _, _
+                   in thumbnails.supported_formats()}
+        self.assertIn('image/webp', formats)
+        self.assertEqual(
+            set(variants.values_list('mime_type', 'width', 'height')),
+            {(mime_type, width, height) for mime_type in formats
+             for width, height in ((480, 170), (960, 339))},
+        )
+
+    def test_concurrent_variants_of_same_image(self):
+        """Если варианты той же картинки одновременно создал другой
+        процесс, make_variants не падает и удаляет свои файлы.
+        """
+        other = list(ImageVariant.objects.filter(source=self.post.image.name))
+        variant_widths = thumbnails.variant_widths
+
+        def created_meanwhile(width):
+            for variant in other:
+                variant.pk = None
+            ImageVariant.objects.bulk_create(other)
+            return variant_widths(width)
+
+        with mock.patch.object(thumbnails, 'variant_widths',
+                               created_meanwhile):
+            thumbnails.make_variants(self.post.image)
+        names = set(ImageVariant.objects.filter(
+            source=self.post.image.name).values_list('image', flat=True))
+        self.assertEqual(names, {variant.image.name for variant in other})
+        directory = os.path.dirname(other[0].image.path)
+        self.assertFalse(os.listdir(directory))
+
+    def test_card_has_picture_sources_without_storage_checks(self):
+        """Карточка выводит <picture> со srcset, не проверяя наличие
+        файлов в хранилище.
+        """
+        with mock.patch.object(FileSystemStorage, 'exists',
+                               side_effect=AssertionError):
+            page = Client().get(reverse('index')).content.decode()
+        variant = ImageVariant.objects.get(
+            source=self.post.image.name, mime_type='image/webp', width=960)
+        self.assertIn('<source type="image/webp"', page)
+        self.assertIn(f'{variant.image.url} 960w', page)
+
+
+@override_settings(THUMBNAIL_ASYNC=False)
+class ThumbnailResolveTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='John')
+        for number in range(5):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=author,
+                image=make_image(f'img{number}.gif'))
+            thumbnails.schedule(post)
+        Post.objects.create(text='Без картинки', author=author)
+        cache.clear()
+        thumbnails.index.clear()
+
+    def test_page_is_resolved_in_one_batch(self):
+        """Картинки всей страницы находятся одним запросом к хранилищу
+        sorl-thumbnail и одним к вариантам, а повторно -- из индекса.
+        """
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(2):
+            thumbnails.resolve(posts)
+        for post in posts:
+            if post.image:
+                self.assertEqual(post.thumbnail.url,
+                                 thumbnails.lookup(post.image, 'card').url)
+                self.assertTrue(post.picture_sources)
+            else:
+                self.assertFalse(hasattr(post, 'thumbnail'))
+
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(0):
+            thumbnails.resolve(posts)
+        self.assertTrue(all(post.thumbnail for post in posts if post.image))
+
+    def test_changed_image_is_forgotten(self):
+        """Смена картинки поста убирает старую картинку из индекса."""
+        post = Post.objects.filter(text='Пост 0').get()
+        thumbnails.resolve([post])
+        old_key = ('card', post.image.name)
+        self.assertIn(old_key, thumbnails.index.get_many([old_key]))
+
+        post.image = make_image('new.gif')
+        post.save()
+        self.assertEqual(thumbnails.index.get_many([old_key]), {})
+
+
+@override_settings(THUMBNAIL_ASYNC=False)
+class ThumbnailScheduleTest(TemporaryMediaMixin, TransactionTestCase):
+    def test_thumbnails_are_created_after_upload(self):
+        """Миниатюры создаются после сохранения поста с новой картинкой."""
+        author = User.objects.create_user(username='John')
+        post = Post.objects.create(
+            text='Тестовый текст', author=author, image=make_image())
+        self.assertIsNotNone(thumbnails.lookup(post.image, 'card'))
+
+        post.image = make_image('other_img.gif')
+        post.save()
+        self.assertIsNotNone(thumbnails.lookup(post.image, 'card'))
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts import trending
+from posts.models import Post, TrendingScore, User
+from posts.tests.utils import TestCase
+
+
+@override_settings(TRENDING_HALF_LIFE=60 * 60, TRENDING_MIN_SCORE=0.5,
+                   TRENDING_WEIGHTS={'like': 1, 'comment': 3})
+class TrendingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='John')
+        self.posts = [Post.objects.create(text=f'Пост {number}',
+                                          author=self.author)
+                      for number in range(3)]
+        self.now = timezone.now()
+
+    def hours_ago(self, hours):
+        return self.now - timedelta(hours=hours)
+
+    def ranking(self):
+        return [post.pk for post in trending.trending_posts(self.now)]
+
+    def test_recent_events_weigh_more(self):
+        """Вклад события вдвое меньше через каждые TRENDING_HALF_LIFE:
+        три лайка двухчасовой давности весят меньше одного свежего.
+        """
+        old, fresh, commented = self.posts
+        for _ in range(3):
+            trending.record(old.pk, 'like', self.hours_ago(2))
+        trending.record(fresh.pk, 'like', self.now)
+        trending.record(commented.pk, 'comment', self.hours_ago(1))
+        self.assertEqual(self.ranking(), [commented.pk, fresh.pk, old.pk])
+
+    def test_decayed_posts_are_hidden_and_compacted(self):
+        old, fresh, _ = self.posts
+        trending.record(old.pk, 'like', self.hours_ago(3))
+        trending.record(fresh.pk, 'like', self.now)
+        self.assertEqual(self.ranking(), [fresh.pk])
+
+        self.assertEqual(trending.compact(self.now), 1)
+        self.assertEqual(list(TrendingScore.objects.values_list(
+            'post_id', flat=True)), [fresh.pk])
+
+    def test_compact_keeps_best_entries(self):
+        for hours, post in enumerate(self.posts):
+            trending.record(post.pk, 'like', self.hours_ago(hours / 10))
+        with override_settings(TRENDING_MAX_ENTRIES=2):
+            self.assertEqual(trending.compact(self.now), 1)
+        self.assertEqual(self.ranking(), [post.pk for post in self.posts[:2]])
+
+    def test_views_record_events(self):
+        post = self.posts[0]
+        client = Client()
+        client.force_login(self.author)
+        client.get(reverse('like', args=(self.author.username, post.pk)))
+        client.post(reverse('add_comment',
+                            args=(self.author.username, post.pk)),
+                    {'text': 'Комментарий'})
+        # Снятый лайк популярность не добавляет
+        client.get(reverse('like', args=(self.author.username, post.pk)))
+        score = TrendingScore.objects.get(post=post).score
+        expected = trending.log_weight(4, timezone.now())
+        self.assertAlmostEqual(score, expected, delta=0.01)
+
+        response = Client().get(reverse('trending'))
+        self.assertEqual(list(response.context['page']), [post])
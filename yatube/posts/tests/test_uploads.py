@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, override_settings
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import Post, User
+from posts.tests.utils import TemporaryMediaMixin, TestCase, make_image
+from PIL import Image
+
+
+class ImageUploadTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='John')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def upload(self, image):
+        return self.client.post(reverse('new_post'), {
+            'title': 'Заголовок', 'subtitle': 'Подзаголовок',
+            'text': 'Пост с картинкой', 'image': image})
+
+    def test_valid_image_is_saved(self):
+        response = self.upload(make_image('image.png', size=(50, 50)))
+        self.assertRedirects(response, reverse('index'))
+        self.assertEqual(Post.objects.get().image.name, 'posts/image.png')
+
+    def test_rejected_uploads(self):
+        """Слишком большие файлы и файлы, которые не являются
+        подходящими картинками, отклоняются с понятной ошибкой.
+        """
+        gif = make_image('image.gif', size=(50, 50), image_format='GIF')
+        cases = {
+            'больше': (make_image('image.png', size=(2000, 2000)),
+                       {'POST_IMAGE_MAX_SIZE': 1024}),
+            'точек': (make_image('image.png', size=(100, 20)),
+                      {'POST_IMAGE_MAX_DIMENSION': 50}),
+            'форматах': (gif, {'POST_IMAGE_FORMATS': ('PNG',)}),
+            'не является картинкой': (
+                SimpleUploadedFile('image.png', b'not an image' * 100), {}),
+        }
+        for message, (image, overrides) in cases.items():
+            with self.subTest(message=message), override_settings(
+                    **overrides):
+                response = self.upload(image)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(message,
+                              ' '.join(response.context['form']['image']
+                                       .errors))
+        self.assertFalse(Post.objects.exists())
+
+    def test_handler_is_installed_by_post_views_only(self):
+        """ImageUploadHandler подключают только формы постов, а CSRF
+        в них проверяется по-прежнему.
+        """
+        self.assertNotIn('posts.uploads.ImageUploadHandler',
+                         settings.FILE_UPLOAD_HANDLERS)
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        data = {'text': 'Пост с картинкой',
+                'image': make_image('image.png', size=(50, 50))}
+        response = client.post(reverse('new_post'), data)
+        self.assertEqual(response.status_code, 403)
+
+        client.get(reverse('new_post'))
+        data = {**data, 'image': make_image('image.png', size=(2000, 2000)),
+                'csrfmiddlewaretoken': client.cookies['csrftoken'].value}
+        with override_settings(POST_IMAGE_MAX_SIZE=1024):
+            response = client.post(reverse('new_post'), data)
+        self.assertIn('больше', ' '.join(
+            response.context['form']['image'].errors))
+
+
+class StripMetadataTest(TemporaryMediaMixin, TestCase):
+    def test_exif_is_removed(self):
+        """EXIF удаляется, а картинка поворачивается по его ориентации."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Повернуть на 90° по часовой стрелке
+        exif[0x010F] = 'Камера'
+        author = User.objects.create_user(username='John')
+        post = Post.objects.create(
+            text='Тестовый текст', author=author,
+            image=make_image('photo.jpg', size=(40, 20),
+                             image_format='JPEG', exif=exif.tobytes()))
+
+        self.assertTrue(thumbnails.strip_metadata(post.image))
+
+        with post.image.storage.open(post.image.name) as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (20, 40))
+            self.assertFalse(image.getexif())
+        self.assertFalse(thumbnails.strip_metadata(post.image))
@@ -1,5 +1,6 @@
-from django.test import Client, TestCase
+from django.test import Client
 from posts.models import Group, Post, User
+from posts.tests.utils import TestCase
 
 
 class PostsURLTests(TestCase):
@@ -107,3 +108,17 @@ class PostsURLTests(TestCase):
         """Сервер возвращает код 404, если страница не найдена"""
         response = self.guest_client.get('/not_existing_url/')
         self.assertEqual(response.status_code, 404)
+
+    def test_profiles_are_not_shadowed_by_site_pages(self):
+        """Страницы поиска и популярного не закрывают профили
+        пользователей с именами search и trending.
+        """
+        for username in ('search', 'trending'):
+            User.objects.create_user(username=username)
+            with self.subTest(username=username):
+                response = self.guest_client.get(f'/{username}/')
+                self.assertTemplateUsed(response, 'profile.html')
+        self.assertTemplateUsed(self.guest_client.get('/posts/search/'),
+                                'search.html')
+        self.assertTemplateUsed(self.guest_client.get('/posts/trending/'),
+                                'trending.html')
@@ -1,13 +1,19 @@
 import shutil
 import tempfile
 import time
+from unittest import mock
 
 from django import forms
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Follow, Group, Post, User
+from posts.models import Comment, Follow, Group, Like, Post, User
+from posts.tests.utils import TestCase
 
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.MEDIA_ROOT))
@@ -317,3 +323,210 @@ class PaginatorTest(TestCase):
                     len(response.context.get('page').object_list),
                     3
                 )
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='John')
+        cls.user = User.objects.create_user(username='Jane')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group-slug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(12):
+            post = Post.objects.create(
+                text=f'Тестовый текст номер {i}',
+                author=cls.author,
+                group=cls.group
+            )
+            Like.objects.create(user=cls.user, post=post)
+            Comment.objects.create(
+                post=post, author=cls.user, text='Комментарий')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueriesTest.user)
+
+    def count_queries(self, url, per_page):
+        cache.clear()
+        with override_settings(PAGINATOR_PER_PAGE=per_page):
+            with CaptureQueriesContext(connection) as context:
+                response = self.authorized_client.get(url)
+        self.assertEqual(len(response.context.get('page')), per_page)
+        return len(context.captured_queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов к БД в лентах не зависит от размера страницы."""
+        urls = [
+            reverse('index'),
+            reverse('follow_index'),
+            reverse('group', kwargs={'slug': FeedQueriesTest.group.slug}),
+            reverse('profile',
+                    kwargs={'username': FeedQueriesTest.author.username}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 2),
+                    self.count_queries(url, 10)
+                )
+
+    def test_feed_posts_have_counters(self):
+        """Посты в ленте содержат счётчики лайков и комментариев."""
+        response = self.authorized_client.get(reverse('index'))
+        first_post = response.context.get('page').object_list[0]
+        self.assertEqual(first_post.likes_count, 1)
+        self.assertEqual(first_post.comments_count, 1)
+
+    def test_feed_posts_have_liked_flag(self):
+        """Посты ленты отмечены, лайкнул ли их текущий пользователь."""
+        Like.objects.filter(
+            user=FeedQueriesTest.user).order_by('-pk').first().delete()
+        response = self.authorized_client.get(reverse('index'))
+        page = response.context.get('page')
+        liked = set(Like.objects.filter(
+            user=FeedQueriesTest.user).values_list('post_id', flat=True))
+        self.assertEqual([post.liked for post in page],
+                         [post.pk in liked for post in page])
+        self.assertIn(False, [post.liked for post in page])
+        self.assertContains(response, 'class="icon solid fa-heart"')
+
+        cache.clear()
+        response = Client().get(reverse('index'))
+        self.assertFalse(any(post.liked for post in response.context['page']))
+
+
+class ToggleTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='John')
+        self.user = User.objects.create_user(username='Jane')
+        self.post = Post.objects.create(text='Тестовый текст',
+                                        author=self.author)
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.like_url = reverse('like', args=(self.author.username,
+                                              self.post.pk))
+
+    def get_json(self, url):
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.json()
+
+    def test_like_toggle_returns_counts(self):
+        self.assertEqual(self.get_json(self.like_url),
+                         {'liked': True, 'likes_count': 1})
+        self.assertEqual(self.get_json(self.like_url),
+                         {'liked': False, 'likes_count': 0})
+        self.assertFalse(Like.objects.exists())
+
+    def test_concurrent_like_does_not_fail(self):
+        """Если лайк поставил одновременный запрос, удалять нечего,
+        а вставка упирается в unique_like -- лайк остаётся.
+        """
+        Like.objects.create(user=self.user, post=self.post)
+        with mock.patch.object(QuerySet, 'delete', return_value=(0, {})):
+            self.assertEqual(self.get_json(self.like_url)['liked'], True)
+        self.assertEqual(Like.objects.count(), 1)
+
+    def test_follow_toggle_returns_counts(self):
+        follow_url = reverse('profile_follow', args=(self.author.username,))
+        unfollow_url = reverse('profile_unfollow',
+                               args=(self.author.username,))
+        for _ in range(2):
+            self.assertEqual(self.get_json(follow_url),
+                             {'following': True, 'followers_count': 1})
+        self.assertEqual(Follow.objects.count(), 1)
+        for _ in range(2):
+            self.assertEqual(self.get_json(unfollow_url),
+                             {'following': False, 'followers_count': 0})
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_without_json_redirects(self):
+        response = self.client.get(
+            reverse('profile_follow', args=(self.author.username,)))
+        self.assertRedirects(response, reverse('profile',
+                                               args=(self.author.username,)))
+
+
+class PostViewQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='John')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author)
+        commenters = [User.objects.create_user(username=f'user{number}')
+                      for number in range(20)]
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=commenters[number % 20],
+                    text=f'Комментарий {number}')
+            for number in range(1000))
+        cls.url = reverse('post', args=(cls.author.username, cls.post.pk))
+
+    def test_queries_do_not_depend_on_comments(self):
+        """Страница поста с 1000 комментариями разных авторов
+        загружается за постоянное число запросов.
+        """
+        client = Client()
+        client.force_login(PostViewQueriesTest.author)
+        cache.clear()
+        # Сессия и пользователь, пост с автором и профилем, лайк
+        # и комментарии с авторами
+        with self.assertNumQueries(5):
+            response = client.get(PostViewQueriesTest.url)
+        self.assertEqual(len(response.context['comments']),
+                         settings.COMMENTS_PER_PAGE)
+        self.assertContains(response, 'name="comment_',
+                            count=settings.COMMENTS_PER_PAGE)
+        cache.clear()
+        with self.assertNumQueries(2):
+            Client().get(PostViewQueriesTest.url)
+
+    def test_comments_are_loaded_by_pages(self):
+        """Все комментарии по порядку читаются фрагментами по курсору,
+        каждый фрагмент -- за два запроса.
+        """
+        client = Client()
+        url = reverse('post_comments', args=(
+            PostViewQueriesTest.author.username, PostViewQueriesTest.post.pk))
+        page = client.get(PostViewQueriesTest.url).context['comments']
+        self.assertContains(client.get(PostViewQueriesTest.url),
+                            f'data-more-comments="{url}?comments='
+                            f'{page.next_cursor}"')
+        loaded = [comment.pk for comment in page]
+        while page.has_next():
+            with self.assertNumQueries(2):
+                response = client.get(url, {'comments': page.next_cursor})
+            page = response.context['comments']
+            loaded += [comment.pk for comment in page]
+        self.assertNotContains(response, 'data-more-comments')
+        self.assertEqual(loaded, list(
+            PostViewQueriesTest.post.comments.order_by(
+                '-created', '-id').values_list('pk', flat=True)))
+
+        response = client.get(reverse('post_comments', args=(
+            'user0', PostViewQueriesTest.post.pk)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_edit_loads_post_once(self):
+        """Проверка авторства и редактирование читают пост одним
+        запросом, не загружая автора.
+        """
+        url = reverse('post_edit', args=(PostViewQueriesTest.author.username,
+                                         PostViewQueriesTest.post.pk))
+        client = Client()
+        client.force_login(PostViewQueriesTest.author)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.context['post'], PostViewQueriesTest.post)
+        tables = [query['sql'].split(' FROM ')[1].split()[0]
+                  for query in context.captured_queries]
+        self.assertEqual(tables.count('"posts_post"'), 1)
+        self.assertEqual(tables.count('"auth_user"'), 1)
+
+        client.force_login(User.objects.get(username='user0'))
+        self.assertRedirects(client.get(url), PostViewQueriesTest.url)
@@ -0,0 +1,70 @@
+import io
+import shutil
+import tempfile
+
+from django import test
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from posts import thumbnails
+from PIL import Image
+
+TEST_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class TestCase(test.TestCase):
+    """TestCase, который очищает кэш перед каждым тестом.
+
+    В кэше живут страницы для анонимов (cache_anonymous_page), число
+    постов лент и карточки постов; без очистки результат теста зависел
+    бы от того, какие тесты выполнялись до него.
+    """
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        cache.clear()
+
+
+class TemporaryMediaMixin:
+    """Подменяет MEDIA_ROOT на время каждого теста временным каталогом
+    и удаляет его после теста.
+
+    Хранилище sorl-thumbnail и индекс миниатюр помнят картинки по именам,
+    а в новом каталоге те же имена означают другие файлы, поэтому кэш
+    и индекс тоже очищаются.
+    """
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        media_root = tempfile.mkdtemp(dir=settings.MEDIA_ROOT)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = test.override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        cache.clear()
+        thumbnails.index.clear()
+
+
+def make_image(name='image.gif', content=None, size=None,
+               image_format='PNG', **params):
+    """Загружаемая картинка name.
+
+    Без size -- GIF с содержимым content, по умолчанию TEST_GIF
+    с дописанным именем: одинаковые картинки хранятся одним файлом,
+    а так у каждого имени свой. С size -- картинка Pillow этого размера
+    в формате image_format, params передаются в Image.save.
+    """
+    if size is None:
+        if content is None:
+            content = TEST_GIF + name.encode()
+        return SimpleUploadedFile(name, content, content_type='image/gif')
+    data = io.BytesIO()
+    Image.new('RGB', size, 'red').save(data, image_format, **params)
+    return SimpleUploadedFile(name, data.getvalue())
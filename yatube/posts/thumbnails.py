@@ -0,0 +1,320 @@
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connections, transaction
+from PIL import Image, ImageOps
+from sorl.thumbnail import base, default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .cache import invalidate_post_cards
+from .models import ImageVariant
+
+logger = logging.getLogger(__name__)
+
+# Миниатюры картинок постов, которые выводят шаблоны:
+# имя -> (геометрия, параметры sorl-thumbnail)
+SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Форматы вариантов картинок от более к менее компактному:
+# (формат Pillow, MIME-тип, расширение, параметры сохранения)
+VARIANT_FORMATS = (
+    ('AVIF', 'image/avif', 'avif', {'quality': 60}),
+    ('WEBP', 'image/webp', 'webp', {'quality': 80, 'method': 4}),
+    ('JPEG', 'image/jpeg', 'jpg', {'quality': 85, 'progressive': True}),
+)
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Миниатюра file_ с такими параметрами, как её назовёт
+        get_thumbnail. Файлы при этом не открываются.
+        """
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def lookup_many(self, files, geometry_string, **options):
+        """Готовые миниатюры картинок files: {имя картинки: ImageFile}.
+
+        Хранилище sorl-thumbnail читается одним запросом к кэшу и одним
+        к БД на все картинки. Ничего не создаёт и, в отличие от
+        kvstore.get, не запоминает отсутствие миниатюры.
+        """
+        thumbnails = {
+            file_.name: self.thumbnail_file(file_, geometry_string,
+                                            **options)
+            for file_ in files
+        }
+        kvstore = default.kvstore
+        if not isinstance(kvstore, CachedDBKVStore):
+            found = {name: kvstore.get(thumbnail)
+                     for name, thumbnail in thumbnails.items()}
+            return {name: thumbnail for name, thumbnail in found.items()
+                    if thumbnail is not None}
+
+        keys = {add_prefix(thumbnail.key): name
+                for name, thumbnail in thumbnails.items()}
+        values = {key: value
+                  for key, value in kvstore.cache.get_many(list(keys)).items()
+                  if value != EMPTY_VALUE}
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            kvstore.cache.set_many(stored,
+                                   sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(stored)
+        return {keys[key]: deserialize_image_file(value)
+                for key, value in values.items()}
+
+
+class ThumbnailIndex:
+    """Индекс в памяти процесса: (размер, имя картинки) -> (миниатюра,
+    элементы <source>). Хранит только картинки, для которых созданы
+    и миниатюра, и варианты, поэтому записи не устаревают: новая
+    картинка всегда получает новое имя. При переполнении вытесняются
+    давно не использованные записи.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        return found
+
+    def set_many(self, entries):
+        with self._lock:
+            self._entries.update(entries)
+            while len(self._entries) > settings.THUMBNAIL_INDEX_SIZE:
+                self._entries.popitem(last=False)
+
+    def forget(self, names):
+        with self._lock:
+            for key in [key for key in self._entries if key[1] in names]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+backend = ThumbnailBackend()
+index = ThumbnailIndex()
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def lookup(image, size):
+    """Миниатюра image размера size из SIZES, если она уже создана."""
+    geometry, options = SIZES[size]
+    return backend.lookup_many([image], geometry, **options).get(image.name)
+
+
+def resolve(posts, size='card'):
+    """Находит миниатюры и варианты картинок всех постов страницы
+    за один вызов и прикрепляет их к постам в атрибутах thumbnail
+    и picture_sources. Сначала картинки ищутся в индексе процесса,
+    остальные -- одним запросом к хранилищу sorl-thumbnail и одним
+    к ImageVariant.
+    """
+    posts = [post for post in posts if post.image]
+    images = {(size, post.image.name): post.image for post in posts}
+    found = index.get_many(images)
+    missing = [images[key] for key in images if key not in found]
+    if missing:
+        geometry, options = SIZES[size]
+        thumbnails = backend.lookup_many(missing, geometry, **options)
+        sources = picture_sources(thumbnails)
+        ready = {(size, name): (thumbnail, sources[name])
+                 for name, thumbnail in thumbnails.items()
+                 if name in sources}
+        index.set_many(ready)
+        found.update(ready)
+        # Миниатюра уже есть, а варианты ещё создаются
+        found.update({(size, name): (thumbnail, [])
+                      for name, thumbnail in thumbnails.items()
+                      if name not in sources})
+    for post in posts:
+        post.thumbnail, post.picture_sources = found.get(
+            (size, post.image.name), (None, []))
+
+
+def supported_formats():
+    """Форматы из VARIANT_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [variant_format for variant_format in VARIANT_FORMATS
+            if variant_format[0] in Image.SAVE]
+
+
+def variant_widths(source_width):
+    """Ширины из IMAGE_VARIANT_WIDTHS, не превышающие ширину исходной
+    картинки (самая узкая создаётся всегда).
+    """
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    return [widths[0]] + [width for width in widths[1:]
+                          if width <= source_width]
+
+
+def make_variants(image):
+    """Создаёт варианты картинки всех ширин и поддерживаемых форматов
+    с тем же кадрированием, что у карточки поста.
+    """
+    card_width, card_height = map(int, SIZES['card'][0].split('x'))
+    with image.storage.open(image.name) as file:
+        source = ImageOps.exif_transpose(Image.open(file)).convert('RGB')
+    directory = hashlib.md5(image.name.encode()).hexdigest()
+    old_variants = ImageVariant.objects.filter(source=image.name)
+    for variant in old_variants:
+        variant.image.delete(save=False)
+    old_variants.delete()
+    variants = []
+    for width in variant_widths(source.width):
+        height = round(width * card_height / card_width)
+        resized = ImageOps.fit(source, (width, height), Image.LANCZOS)
+        for pil_format, mime_type, extension, params in supported_formats():
+            content = io.BytesIO()
+            resized.save(content, pil_format, **params)
+            variant = ImageVariant(source=image.name, width=width,
+                                   height=height, mime_type=mime_type)
+            variant.image.save(f'{directory}/{width}.{extension}',
+                               ContentFile(content.getvalue()), save=False)
+            variants.append(variant)
+    try:
+        with transaction.atomic():
+            ImageVariant.objects.bulk_create(variants)
+    except IntegrityError:
+        # Варианты той же картинки одновременно создал другой поток или
+        # процесс, например для дубликата, загруженного в другой пост
+        for variant in variants:
+            variant.image.delete(save=False)
+
+
+def picture_sources(names):
+    """Элементы <source> для картинок names: {имя картинки: [MIME-тип
+    и srcset по каждому формату]}. Читает только записи ImageVariant.
+    """
+    srcsets = {}
+    variants = ImageVariant.objects.filter(
+        source__in=names).order_by('width')
+    for variant in variants:
+        srcsets.setdefault(variant.source, {}).setdefault(
+            variant.mime_type, []).append(
+            f'{variant.image.url} {variant.width}w')
+    return {
+        name: [{'type': mime_type, 'srcset': ', '.join(srcset[mime_type])}
+               for _, mime_type, _, _ in VARIANT_FORMATS
+               if mime_type in srcset]
+        for name, srcset in srcsets.items()
+    }
+
+
+def strip_metadata(image):
+    """Перезаписывает картинку без EXIF (в нём бывают координаты
+    и модель камеры), повернув её по EXIF-ориентации. Картинки без
+    EXIF и анимированные не трогаются. Возвращает, была ли картинка
+    перезаписана.
+    """
+    with image.storage.open(image.name) as file:
+        source = Image.open(file)
+        if getattr(source, 'is_animated', False) or not source.getexif():
+            return False
+        source.load()
+    result = ImageOps.exif_transpose(source)
+    params = {'icc_profile': source.info.get('icc_profile')}
+    if source.format in ('JPEG', 'WEBP'):
+        params['quality'] = 90
+    content = io.BytesIO()
+    result.save(content, source.format, **params)
+    with image.storage.open(image.name, 'wb') as file:
+        file.write(content.getvalue())
+    return True
+
+
+def is_processed(image):
+    """Созданы ли уже все миниатюры и варианты картинки, например для
+    другого поста с той же картинкой.
+    """
+    return (all(lookup(image, size) is not None for size in SIZES)
+            and ImageVariant.objects.filter(source=image.name).exists())
+
+
+def generate(post_id, image):
+    """Убирает из картинки поста EXIF, создаёт все её варианты
+    и миниатюры и сбрасывает карточку поста, в которой до этого
+    выводилась заглушка. Миниатюры создаются последними: по ним resolve
+    считает картинку готовой. Картинку, уже обработанную для другого
+    поста, повторно не обрабатывает.
+    """
+    index.forget([image.name])
+    if not is_processed(image):
+        strip_metadata(image)
+        make_variants(image)
+        for geometry, options in SIZES.values():
+            backend.get_thumbnail(image, geometry, **options)
+        index.forget([image.name])
+    invalidate_post_cards([post_id])
+
+
+def run_in_background(post_id, image):
+    try:
+        generate(post_id, image)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image)
+    finally:
+        connections.close_all()
+
+
+def schedule(post):
+    """Ставит создание миниатюр картинки поста в очередь пула потоков.
+    При THUMBNAIL_ASYNC = False миниатюры создаются сразу.
+    """
+    if not post.image:
+        return
+    if settings.THUMBNAIL_ASYNC:
+        get_executor().submit(run_in_background, post.pk, post.image)
+    else:
+        generate(post.pk, post.image)
+
+
+def image_changed(post):
+    """Загружена ли в пост новая картинка."""
+    return str(post.loaded_value('image') or '') != (post.image.name or '')
@@ -0,0 +1,83 @@
+import math
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Post, TrendingScore
+
+# Сколько раз пытаться записать событие, если счёт поста одновременно
+# изменил другой запрос
+ATTEMPTS = 5
+
+
+def log_weight(weight, when):
+    """Логарифм вклада события с весом weight в момент when.
+
+    Вместо того чтобы уменьшать счёт всех постов с течением времени,
+    вклад каждого следующего события растёт как 2 ** (t / TRENDING_HALF_LIFE):
+    отношение счетов постов от этого не меняется, поэтому их можно
+    сортировать по индексу. Логарифм не даёт числам переполниться.
+    """
+    return math.log(weight) + (
+        when.timestamp() * math.log(2) / settings.TRENDING_HALF_LIFE)
+
+
+def log_add(a, b):
+    """log(exp(a) + exp(b)) без переполнения."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def record(post_id, event, when=None, count=1):
+    """Добавляет к счёту поста count событий event из TRENDING_WEIGHTS.
+
+    Счёт меняется условным UPDATE по прочитанному значению, поэтому
+    одновременные события не теряются.
+    """
+    value = log_weight(settings.TRENDING_WEIGHTS[event] * count,
+                       when or timezone.now())
+    scores = TrendingScore.objects.filter(post_id=post_id)
+    for _ in range(ATTEMPTS):
+        current = scores.values_list('score', flat=True).first()
+        if current is None:
+            try:
+                with transaction.atomic():
+                    TrendingScore.objects.create(post_id=post_id,
+                                                 score=value)
+                return True
+            except IntegrityError:
+                continue
+        if scores.filter(score=current).update(
+                score=log_add(current, value)):
+            return True
+    return False
+
+
+def min_score(now=None):
+    """Счёт, ниже которого пост к моменту now уже не популярен."""
+    return log_weight(settings.TRENDING_MIN_SCORE, now or timezone.now())
+
+
+def trending_posts(now=None):
+    """TRENDING_SIZE самых популярных постов. Читаются по индексу
+    trending_score_idx, начиная с наибольшего счёта.
+    """
+    return Post.objects.for_feed().filter(
+        trending__score__gte=min_score(now),
+    ).order_by('-trending__score', '-id')[:settings.TRENDING_SIZE]
+
+
+def compact(now=None):
+    """Удаляет затухшие счета и всё, что не входит
+    в TRENDING_MAX_ENTRIES лучших. Возвращает число удалённых записей.
+    """
+    deleted, _ = TrendingScore.objects.filter(
+        score__lt=min_score(now)).delete()
+    cutoff = TrendingScore.objects.order_by('-score').values_list(
+        'score', flat=True)[settings.TRENDING_MAX_ENTRIES:][:1]
+    if cutoff:
+        removed, _ = TrendingScore.objects.filter(
+            score__lte=cutoff[0]).delete()
+        deleted += removed
+    return deleted
@@ -0,0 +1,84 @@
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+
+def check_image_header(data, complete):
+    """Проверяет формат и размеры картинки по её началу data, не
+    декодируя саму картинку. Возвращает (проверено ли, ошибка или None);
+    если данных пока мало и complete ложно, проверка откладывается.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        return True, 'Слишком большая картинка.'
+    except Exception:
+        if complete or len(data) >= settings.POST_IMAGE_HEADER_SIZE:
+            return True, ('Загрузите картинку. Файл, который вы загрузили, '
+                          'поврежден или не является картинкой.')
+        return False, None
+    if image_format not in settings.POST_IMAGE_FORMATS:
+        return True, 'Поддерживаются картинки в форматах {}.'.format(
+            ', '.join(settings.POST_IMAGE_FORMATS))
+    limit = settings.POST_IMAGE_MAX_DIMENSION
+    if width > limit or height > limit:
+        return True, f'Картинка должна быть не больше {limit}×{limit} точек.'
+    return True, None
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемый файл во временный файл по частям и проверяет
+    его, не дожидаясь конца загрузки: формат и размеры картинки -- по
+    первым байтам, объём -- по каждой части. Данные отклонённого файла
+    дальше не сохраняются, а причина передаётся в форму в атрибуте
+    upload_error загруженного файла. По пути считается sha256 файла
+    для posts.storage.DeduplicatingStorage.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.sha256 = hashlib.sha256()
+        self.header = b''
+        self.checked = False
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_SIZE:
+            return self.reject('Файл должен быть не больше {}.'.format(
+                filesizeformat(settings.POST_IMAGE_MAX_SIZE)))
+        if not self.checked:
+            self.header += raw_data
+            self.checked, error = check_image_header(
+                self.header, complete=False)
+            if error:
+                return self.reject(error)
+            if self.checked:
+                self.header = b''
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.checked and not self.error:
+            _, self.error = check_image_header(self.header, complete=True)
+            if self.error:
+                self.reject(self.error)
+        uploaded = super().file_complete(file_size)
+        uploaded.upload_error = self.error
+        uploaded.sha256 = self.sha256.hexdigest()
+        return uploaded
+
+    def reject(self, error):
+        self.error = error
+        self.header = b''
+        self.file.seek(0)
+        self.file.truncate()
+        return None
@@ -1,20 +1,28 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.http import HttpResponseRedirect
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseRedirect, JsonResponse
+from django.utils.http import urlencode
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 
-from .decorators import is_post_author
+from . import trending
+from .decorators import cache_anonymous_page, image_uploads, is_post_author
+from .feeds import FOLLOW_FEED_KEYS, follow_feed
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Like, Post, User
+from .likes import likes_count, mark_liked, toggle_like
+from .models import Follow, Group, Post, Profile, User
+from .paginators import CursorPaginator, WindowPaginator, paginate
+from .search import SearchResults
+from .thumbnails import resolve
 
 
+@cache_anonymous_page
 def index(request):
-    post_list = Post.objects.select_related('group').all()
-    paginator = Paginator(post_list, settings.PAGINATOR_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page = paginate(request, post_list)
+    resolve(page)
+    mark_liked(page, request.user)
     return render(
         request,
         'index.html',
@@ -22,12 +30,27 @@ def index(request):
     )
 
 
+@cache_anonymous_page
+def trending_index(request):
+    paginator = WindowPaginator(trending.trending_posts(),
+                                settings.PAGINATOR_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    resolve(page)
+    mark_liked(page, request.user)
+    return render(
+        request,
+        'trending.html',
+        {'page': page}
+    )
+
+
+@cache_anonymous_page
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts.all()
-    paginator = Paginator(posts_list, settings.PAGINATOR_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts_list = group.posts.for_feed()
+    page = paginate(request, posts_list)
+    resolve(page)
+    mark_liked(page, request.user)
 
     return render(
         request,
@@ -36,49 +59,102 @@ def group_posts(request, slug):
     )
 
 
+def author_counters(author):
+    """Счётчики автора для шапки его страниц. У пользователя может не
+    быть профиля (создан loaddata или до появления счётчиков): тогда
+    нули, пока профиль не создаст команда rebuild_counters.
+    """
+    profile = getattr(author, 'profile', None)
+    return {'posts_count': getattr(profile, 'posts_count', 0),
+            'follows': getattr(profile, 'following_count', 0),
+            'followed_by': getattr(profile, 'followers_count', 0)}
+
+
+@cache_anonymous_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts_list = author.posts.all()
-    posts_count = posts_list.count()
-    paginator = Paginator(posts_list, settings.PAGINATOR_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+    posts_list = author.posts.for_feed()
+    page = paginate(request, posts_list)
+    resolve(page)
+    mark_liked(page, request.user)
     if request.user.is_authenticated:
         following = (
             Follow.objects.filter(user=request.user, author=author).exists())
     else:
         following = False
-    follows = author.follower.count()
-    followed_by = author.following.count()
 
     return render(request, 'profile.html',
                   {'author': author,
-                   'posts_count': posts_count,
                    'page': page,
                    'following': following,
-                   'follows': follows,
-                   'followed_by': followed_by})
+                   **author_counters(author)})
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    results = SearchResults(Post.objects.for_feed(), query)
+    paginator = WindowPaginator(results, settings.PAGINATOR_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    resolve(page)
+    mark_liked(page, request.user)
+    return render(
+        request,
+        'search.html',
+        {'page': page, 'query': query,
+         'page_query': urlencode({'q': query}) + '&'}
+    )
+
+
+# Порядок комментариев поста; совпадает с индексом
+# comment_post_created_idx
+COMMENT_KEYS = ('-created', '-id')
+
+
+def comments_page(request, post):
+    """Страница комментариев поста по курсору ?comments=.
+
+    Авторы комментариев загружаются тем же запросом, читаются только
+    выводимые столбцы. post_id нужен менеджеру post.comments, чтобы
+    подставить в комментарии уже загруженный пост.
+    """
+    comments = post.comments.select_related('author').only(
+        'post_id', 'text', 'created', 'author__username')
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE,
+                                keys=COMMENT_KEYS)
+    return paginator.get_page(request.GET.get('comments'))
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    comments = post.comments.all()
-    posts_count = post.author.posts.all().count()
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__profile'),
+        id=post_id, author__username=username)
+    comments = comments_page(request, post)
     form = CommentForm()
-
-    follows = post.author.follower.count()
-    followed_by = post.author.following.count()
+    resolve([post])
+    mark_liked([post], request.user)
 
     return render(request, 'post.html',
                   {'author': post.author,
-                   'posts_count': posts_count,
                    'post': post,
                    'form': form,
                    'comments': comments,
-                   'follows': follows,
-                   'followed_by': followed_by})
+                   **author_counters(post.author)})
+
 
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев поста: фрагмент для подгрузки
+    по ссылке «Показать ещё».
+    """
+    post = get_object_or_404(Post.objects.only('id'),
+                             id=post_id, author__username=username)
+    return render(request, 'includes/comment_list.html',
+                  {'comments': comments_page(request, post),
+                   'username': username,
+                   'post_id': post_id})
 
+
+@image_uploads
 @login_required
 def new_post(request):
     if request.method == 'POST':
@@ -96,11 +172,10 @@ def new_post(request):
     return render(request, 'post_editing.html', {'form': form})
 
 
+@image_uploads
 @login_required
 @is_post_author
-def post_edit(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-
+def post_edit(request, username, post_id, post):
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if form.is_valid():
@@ -122,15 +197,17 @@ def add_comment(request, username, post_id):
             new_comment.author = request.user
             new_comment.post = post
             new_comment.save()
+            trending.record(post.pk, 'comment')
     return redirect(reverse_lazy('post', args=(username, post_id)))
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.PAGINATOR_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    entries = follow_feed(request.user)
+    page = paginate(request, entries, keys=FOLLOW_FEED_KEYS)
+    page.object_list = [entry.post for entry in page.object_list]
+    resolve(page)
+    mark_liked(page, request.user)
     return render(
         request,
         'follow.html',
@@ -138,40 +215,51 @@ def follow_index(request):
     )
 
 
+def wants_json(request):
+    """Ждёт ли запрос (например, от static/js/toggles.js) ответ в JSON
+    вместо перенаправления.
+    """
+    return (request.is_ajax()
+            or 'application/json' in request.META.get('HTTP_ACCEPT', ''))
+
+
+def follow_response(request, author, following):
+    if wants_json(request):
+        followers_count = Profile.objects.filter(user=author).values_list(
+            'followers_count', flat=True).first()
+        return JsonResponse({'following': following,
+                             'followers_count': followers_count or 0})
+    return redirect(reverse_lazy('profile', args=(author.username,)))
+
+
 @login_required
 def profile_follow(request, username):
-    user = request.user
     author = get_object_or_404(User, username=username)
-    if (author != user):
-        new_follow, created = Follow.objects.get_or_create(
-            user=user,
-            author=author,
-        )
-        new_follow.save()
-
-    return redirect(reverse_lazy('profile', args=(username,)))
+    if author != request.user:
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+        except IntegrityError:
+            # Подписка уже есть
+            pass
+    return follow_response(request, author, author != request.user)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    get_object_or_404(Follow, user=request.user, author=author).delete()
-    return redirect(reverse_lazy('profile', args=(username,)))
+    Follow.objects.filter(user=request.user, author=author).delete()
+    return follow_response(request, author, False)
 
 
 @login_required
 def like(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    # if (post.author != request.user):
-    like, created = Like.objects.get_or_create(
-        user=request.user,
-        post=post,
-    )
-    if created:
-        like.save()
-    else:
-        like.delete()
-
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id,
+                             author__username=username)
+    liked = toggle_like(request.user, post.pk)
+    if wants_json(request):
+        return JsonResponse({'liked': liked,
+                             'likes_count': likes_count(post.pk)})
     return HttpResponseRedirect(request.META.get('HTTP_REFERER', '/'))
 
 
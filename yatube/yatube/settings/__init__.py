@@ -0,0 +1,13 @@
+"""
+Настройки выбираются переменной окружения DJANGO_ENV: 'production' --
+боевой профиль (yatube/settings/production.py), иначе -- профиль для
+разработки (yatube/settings/development.py). Профиль можно указать
+и напрямую: DJANGO_SETTINGS_MODULE=yatube.settings.production.
+"""
+
+import os
+
+if os.environ.get('DJANGO_ENV') == 'production':
+    from .production import *  # noqa: F401,F403
+else:
+    from .development import *  # noqa: F401,F403
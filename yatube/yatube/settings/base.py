@@ -0,0 +1,253 @@
+"""
+Django settings for yatube project: общие для всех профилей настройки
+(см. yatube/settings/__init__.py).
+
+Generated by 'django-admin startproject' using Django 2.2.19.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/2.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/2.2/ref/settings/
+"""
+
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = '3_fh!wa$z(=rk7m+lzru!_5caf+s(i^gcp3xru_vv!i7n0!y=j'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+    'www.yanktr.pythonanywhere.com',
+    'yanktr.pythonanywhere.com',
+]
+
+# Application definition
+
+INSTALLED_APPS = [
+    'users.apps.UsersConfig',
+    'posts.apps.PostsConfig',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'yatube.context_processors.year'
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+    }
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+
+STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+
+MEDIA_URL = '/media/'
+
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Login
+
+LOGIN_URL = '/auth/login/'
+
+LOGIN_REDIRECT_URL = 'index'
+
+# LOGOUT_REDIRECT_URL = 'index'
+
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+PAGINATOR_PER_PAGE = 5
+
+# Сколько комментариев показывать на странице поста и подгружать
+# по ссылке «Показать ещё»
+COMMENTS_PER_PAGE = 20
+
+# Режим пагинации лент по умолчанию: 'numbered' (?page=N) или 'cursor'.
+# Ссылки вида ?page=N работают в обоих режимах.
+FEED_PAGINATION = 'numbered'
+
+# Сколько секунд хранить в кэше общее число постов ленты
+PAGINATOR_COUNT_TIMEOUT = 60 * 60
+
+# Выше этого числа постов точный COUNT(*) заменяется оценкой
+PAGINATOR_COUNT_THRESHOLD = 10000
+
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGINATOR_WINDOW = 2
+
+# Посты авторов с большим числом подписчиков не раскладываются по лентам
+# при публикации, а подтягиваются читателями при открытии ленты
+FEED_FANOUT_LIMIT = 10000
+
+# Сколько последних постов автора добавлять в ленту при подписке
+FEED_BACKFILL = 100
+
+# Карточки постов в кэше; версию меняют при правке includes/post_card.html
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+POST_CARD_VERSION = 3
+
+# EXIF удаляется из картинок, а миниатюры создаются в пуле из
+# THUMBNAIL_WORKERS потоков после сохранения поста; при
+# THUMBNAIL_ASYNC = False -- сразу при сохранении
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Картинки постов (posts.decorators.image_uploads) пишутся во временный
+# файл по частям; картинка отклоняется, как только превысит
+# POST_IMAGE_MAX_SIZE байт или если формат и размеры по первым
+# POST_IMAGE_HEADER_SIZE байтам не подходят
+POST_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+POST_IMAGE_HEADER_SIZE = 256 * 1024
+POST_IMAGE_MAX_DIMENSION = 8000
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Ширины вариантов картинок постов для srcset; кроме JPEG варианты
+# сохраняются в WebP и AVIF, если их поддерживает установленный Pillow
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+
+# Сколько готовых картинок помнит индекс миниатюр в памяти процесса
+THUMBNAIL_INDEX_SIZE = 10000
+
+# Поиск учитывает не больше стольких слов запроса
+SEARCH_MAX_TERMS = 8
+
+# Популярные посты: вклад лайка или комментария (TRENDING_WEIGHTS)
+# уменьшается вдвое за TRENDING_HALF_LIFE секунд; на странице
+# популярного выводится TRENDING_SIZE постов с наибольшим счётом
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_WEIGHTS = {'like': 1, 'comment': 3}
+TRENDING_SIZE = 100
+# Команда compact_trending удаляет счёт постов, затухший ниже
+# TRENDING_MIN_SCORE, и всё, что не входит в TRENDING_MAX_ENTRIES лучших
+TRENDING_MIN_SCORE = 0.05
+TRENDING_MAX_ENTRIES = 10000
+
+# Лайки через очередь (write-behind): запрос не пишет в БД, а только
+# дописывает переключение лайка в журнал LIKES_LOG_PATH; в Like они
+# пишутся пачками, когда в журнале наберётся LIKES_FLUSH_SIZE записей,
+# и командой flush_likes. Журнал -- файл на локальном диске, общий для
+# всех воркеров на машине
+LIKES_WRITE_BEHIND = False
+LIKES_LOG_PATH = os.path.join(BASE_DIR, 'likes.log')
+LIKES_FLUSH_SIZE = 500
+
+# Кэш страниц для анонимных посетителей: сколько секунд страница свежая,
+# сколько ещё можно отдавать устаревшую, пока её пересобирает один запрос,
+# и сколько ждать чужой пересборки, если в кэше ничего нет
+PAGE_CACHE_TIMEOUT = 60
+PAGE_CACHE_STALE_TIMEOUT = 60 * 10
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_LOCK_WAIT = 2
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Общий для всех воркеров кэш в файле SQLite: включается переменной
+# окружения SHARED_CACHE_PATH с путём к файлу кэша
+SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH')
+if SHARED_CACHE_PATH:
+    CACHES['default'] = {
+        'BACKEND': 'yatube.sqlite_cache.SQLiteCache',
+        'LOCATION': SHARED_CACHE_PATH,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
@@ -0,0 +1,51 @@
+"""Боевые настройки: без DEBUG, debug_toolbar и раздачи статики
+через Django.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, TEMPLATES
+
+DEBUG = False
+
+# Ключ из base.py опубликован в репозитории, поэтому без своего ключа
+# профиль не запускается
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured(
+        'Задайте секретный ключ в переменной окружения DJANGO_SECRET_KEY.')
+
+# Соединение с БД живёт CONN_MAX_AGE секунд, а не закрывается
+# после каждого запроса
+DATABASES = {
+    'default': {**DATABASES['default'], 'CONN_MAX_AGE': 60},
+}
+
+# Сессии читаются из кэша и только при промахе -- из БД. Чтобы кэш
+# сессий был общим для всех воркеров, нужен SHARED_CACHE_PATH
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Скомпилированные шаблоны хранятся в памяти, а include с постоянным
+# именем встраиваются при загрузке (InliningLoader); wsgi.py загружает
+# все шаблоны при запуске
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor for processor in TEMPLATES[0]['OPTIONS'][
+                'context_processors']
+            if processor != 'django.template.context_processors.debug'
+        ],
+        'loaders': [
+            ('yatube.template_loader.InliningLoader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
@@ -0,0 +1,226 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+    Файл открывается в режиме WAL и читается через mmap, так что
+    чтения из разных процессов не блокируют друг друга. Поддерживаются
+    срок жизни ключей, вытеснение давно не читанных записей (LRU) при
+    превышении MAX_ENTRIES и атомарный incr между процессами.
+
+    OPTIONS:
+        MAX_ENTRIES -- сколько записей хранить (по умолчанию 300);
+        CULL_FREQUENCY -- при переполнении удаляется 1/CULL_FREQUENCY
+            записей (по умолчанию 3), при 0 -- все, как в кэшах Django;
+        CULL_EVERY -- как часто (раз в сколько записей) проверять
+            переполнение (по умолчанию 100);
+        MMAP_SIZE -- сколько байт файла отображать в память
+            (по умолчанию 256 МБ);
+        BUSY_TIMEOUT -- сколько секунд ждать блокировку записи.
+    """
+    # Время последнего чтения обновляется не чаще раза в столько секунд,
+    # чтобы чтения почти никогда не писали в файл
+    ACCESS_RESOLUTION = 1
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._mmap_size = int(options.get('MMAP_SIZE', 256 * 1024 * 1024))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    def _connection(self):
+        local = self._local
+        # После fork соединение родителя использовать нельзя
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=self._busy_timeout,
+                isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f'PRAGMA mmap_size={self._mmap_size}')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB, '
+                'expires REAL, accessed REAL NOT NULL)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_accessed '
+                'ON cache (accessed)')
+            local.connection = connection
+            local.pid = os.getpid()
+            local.sets = 0
+        return local.connection
+
+    @staticmethod
+    def _encode(value):
+        # Целые числа хранятся как INTEGER, чтобы incr выполнялся в SQL
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._connection()
+        with _transaction(connection):
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now))
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?)',
+                (key, self._encode(value), self.get_backend_timeout(timeout),
+                 now)).rowcount == 1
+        if added:
+            self._maybe_cull()
+        return added
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys_map = {self._key(key, version): key for key in keys}
+        if not keys_map:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT key, value, accessed FROM cache WHERE key IN ({}) '
+            'AND (expires IS NULL OR expires > ?)'.format(
+                ', '.join('?' * len(keys_map))),
+            (*keys_map, now)).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if now - accessed > self.ACCESS_RESOLUTION]
+        if stale:
+            connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key IN ({})'.format(
+                    ', '.join('?' * len(stale))),
+                (now, *stale))
+        return {keys_map[key]: self._decode(value)
+                for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self._key(key, version), self._encode(value), expires, now)
+                for key, value in data.items()]
+        connection = self._connection()
+        with _transaction(connection):
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows)
+        self._maybe_cull(len(rows))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        return self._connection().execute(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now)
+        ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._connection()
+        with _transaction(connection):
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, now)).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._decode(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._encode(value), now, key))
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._connection().execute(
+                'DELETE FROM cache WHERE key IN ({})'.format(
+                    ', '.join('?' * len(keys))), keys)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone() is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы потока
+        pass
+
+    def _maybe_cull(self, written=1):
+        local = self._local
+        local.sets += written
+        if local.sets < self._cull_every:
+            return
+        local.sets = 0
+        connection = self._connection()
+        with _transaction(connection):
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache')
+            else:
+                # Удаляем самые давно читанные записи
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY accessed LIMIT ?)',
+                    (max(count - self._max_entries,
+                         count // self._cull_frequency),))
+
+
+class _transaction:
+    """BEGIN IMMEDIATE ... COMMIT: запись сразу берёт блокировку файла,
+    поэтому чтение-изменение-запись атомарно между процессами.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
@@ -0,0 +1,117 @@
+import os
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.base import Node
+from django.template.loader_tags import BlockNode, ExtendsNode, IncludeNode
+from django.template.loaders import cached
+
+
+class InlineIncludeNode(Node):
+    """{% include %} шаблона с постоянным именем, узлы которого встроены
+    в шаблон при загрузке: при отрисовке шаблон не ищется заново.
+    """
+    child_nodelists = ()
+
+    def __init__(self, include, template):
+        self.token = include.token
+        self.origin = include.origin
+        self.template = template
+        self.template_name = template.origin.template_name
+        self.nodelist = template.nodelist
+        self.extra_context = include.extra_context
+        self.isolated_context = include.isolated_context
+
+    def __repr__(self):
+        return f'<{self.__class__.__qualname__}: {self.template_name}>'
+
+    def render(self, context):
+        values = {name: var.resolve(context)
+                  for name, var in self.extra_context.items()}
+        # Как Template.render: у каждого подключения своё состояние
+        # {% cycle %} и других тегов, хранящих его в render_context
+        with context.render_context.push_state(self.template):
+            if self.isolated_context:
+                return self.nodelist.render(context.new(values))
+            with context.push(**values):
+                return self.nodelist.render(context)
+
+
+def child_nodelists(node):
+    if hasattr(node, 'conditions_nodelists'):
+        return [nodelist for _, nodelist in node.conditions_nodelists]
+    return [getattr(node, name) for name in node.child_nodelists
+            if getattr(node, name, None)]
+
+
+class InliningLoader(cached.Loader):
+    """cached.Loader, который вдобавок встраивает в загруженный шаблон
+    {% include %} с постоянным именем, например post_item.html в ленте.
+
+    Не встраиваются шаблоны с {% extends %} и {% block %}: внутри чужого
+    {% block %} они бы изменили наследование.
+    """
+
+    def get_template(self, template_name, skip=None):
+        template = super().get_template(template_name, skip)
+        if not getattr(template, 'includes_inlined', False):
+            template.includes_inlined = True
+            self.inline_includes(template.nodelist, template_name)
+        return template
+
+    def inline_includes(self, nodelist, template_name):
+        for index, node in enumerate(nodelist):
+            if isinstance(node, IncludeNode):
+                included = self.static_include(node, template_name)
+                if included is not None:
+                    nodelist[index] = InlineIncludeNode(node, included)
+                continue
+            for child in child_nodelists(node):
+                self.inline_includes(child, template_name)
+
+    def static_include(self, node, template_name):
+        """Шаблон, который node подключает всегда один и тот же, или None."""
+        name = node.template.var
+        if (node.template.filters or not isinstance(name, str)
+                or name == template_name):
+            return None
+        try:
+            template = self.get_template(name)
+        except TemplateDoesNotExist:
+            return None
+        if template.nodelist.get_nodes_by_type((ExtendsNode, BlockNode)):
+            return None
+        return template
+
+
+def template_names(loader):
+    """Имена всех шаблонов в каталогах загрузчика."""
+    for directory in getattr(loader, 'get_dirs', list)():
+        for root, _, files in os.walk(directory):
+            for file in files:
+                path = os.path.join(root, file)
+                yield os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def warm_up():
+    """Загружает заранее все шаблоны движков с кэширующим загрузчиком,
+    чтобы первые запросы после запуска не компилировали их.
+    Возвращает число загруженных шаблонов.
+    """
+    loaded = 0
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for loader in engine.template_loaders:
+            if not isinstance(loader, cached.Loader):
+                continue
+            for source in loader.loaders:
+                for name in template_names(source):
+                    try:
+                        loader.get_template(name)
+                    except (TemplateDoesNotExist, TemplateSyntaxError,
+                            UnicodeDecodeError):
+                        # Непригодный шаблон упадёт и при отрисовке
+                        continue
+                    loaded += 1
+    return loaded
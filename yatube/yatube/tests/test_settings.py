@@ -0,0 +1,34 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from yatube.settings import base, development
+from yatube.tests.utils import import_production
+
+production = import_production()
+
+
+class SettingsProfilesTest(SimpleTestCase):
+    def test_production_drops_debug_tools(self):
+        self.assertTrue(development.DEBUG)
+        self.assertFalse(production.DEBUG)
+        self.assertIn('debug_toolbar', development.INSTALLED_APPS)
+        for profile in (base, production):
+            with self.subTest(profile=profile.__name__):
+                self.assertNotIn('debug_toolbar', profile.INSTALLED_APPS)
+                self.assertFalse([name for name in profile.MIDDLEWARE
+                                  if name.startswith('debug_toolbar')])
+
+    def test_production_keeps_connections_and_caches_sessions(self):
+        self.assertGreater(production.DATABASES['default']['CONN_MAX_AGE'],
+                           0)
+        self.assertEqual(production.SESSION_ENGINE,
+                         'django.contrib.sessions.backends.cached_db')
+        # Профили не меняют общие настройки из base
+        self.assertNotIn('loaders', base.TEMPLATES[0]['OPTIONS'])
+        self.assertEqual(development.DATABASES, base.DATABASES)
+
+    def test_production_requires_secret_key(self):
+        self.assertEqual(production.SECRET_KEY, 'test-secret-key')
+        for secret_key in (None, ''):
+            with self.subTest(secret_key=secret_key):
+                with self.assertRaises(ImproperlyConfigured):
+                    import_production(secret_key)
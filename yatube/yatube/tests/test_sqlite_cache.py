@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+from yatube.sqlite_cache import SQLiteCache
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        self.cache.set('key', {'value': [1, 2]})
+        self.cache.set('number', 5)
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertEqual(self.cache.get_many(['key', 'number', 'missing']),
+                         {'key': {'value': [1, 2]}, 'number': 5})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_values_are_shared_between_instances(self):
+        """Два экземпляра на одном файле, как два воркера, видят
+        записи друг друга.
+        """
+        other = SQLiteCache(self.location, {})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_ttl(self):
+        self.cache.set('key', 'value', timeout=0.1)
+        self.cache.set('forever', 'value', timeout=None)
+        self.assertTrue(self.cache.add('other', 'value', timeout=0.1))
+        time.sleep(0.2)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('other'))
+        self.assertTrue(self.cache.add('other', 'new'))
+        self.assertEqual(self.cache.get('other'), 'new')
+        self.assertEqual(self.cache.get('forever'), 'value')
+        self.assertFalse(self.cache.touch('key'))
+        self.assertTrue(self.cache.touch('forever', timeout=0.1))
+        time.sleep(0.2)
+        self.assertIsNone(self.cache.get('forever'))
+
+    def test_add_keeps_existing_value(self):
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.decr('counter', 5), -3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_between_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_least_recently_used_keys_are_evicted(self):
+        cache = SQLiteCache(self.location, {'OPTIONS': {
+            'MAX_ENTRIES': 10, 'CULL_EVERY': 1}})
+        cache.ACCESS_RESOLUTION = 0
+        for number in range(10):
+            cache.set(f'key{number}', number)
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key10'), 10)
+
+    def test_zero_cull_frequency_clears_cache(self):
+        cache = SQLiteCache(self.location, {'OPTIONS': {
+            'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 0, 'CULL_EVERY': 1}})
+        for number in range(11):
+            cache.set(f'key{number}', number)
+        self.assertEqual(cache.get_many([f'key{number}'
+                                         for number in range(11)]), {})
+        cache.set('key', 'value')
+        self.assertEqual(cache.get('key'), 'value')
+
+    def test_clear(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.template import Context, Engine
+from django.template.loader_tags import IncludeNode
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Group, Post, User
+from yatube.settings import development
+from yatube.template_loader import InlineIncludeNode, warm_up
+from yatube.tests.utils import import_production
+
+TEMPLATES = {
+    'feed.html': ('{% for item in items %}'
+                  '{% include "item.html" with value=item %}'
+                  '{% endfor %}'
+                  '{% include "item.html" only %}'
+                  '{% include name %}'),
+    'item.html': '[{{ value|default:"-" }}{% include "footer.html" %}]',
+    'footer.html': '{{ title }}',
+    'block.html': '{% block title %}{{ title }}{% endblock %}',
+    'page.html': ('{% extends "base.html" %}'
+                  '{% block title %}{% include "block.html" %}'
+                  '{% endblock %}'),
+    'base.html': '<{% block title %}{% endblock %}>',
+    'cycle.html': ('{% for item in items %}{% include "x.html" %},'
+                   '{% endfor %}{% include "x.html" %}'),
+    'x.html': '{% cycle "a" "b" %}',
+}
+
+
+def make_engine(loader):
+    return Engine(loaders=[
+        (loader, [('django.template.loaders.locmem.Loader', TEMPLATES)]),
+    ])
+
+
+class InliningLoaderTest(SimpleTestCase):
+    def setUp(self):
+        self.engine = make_engine('yatube.template_loader.InliningLoader')
+        self.plain = make_engine('django.template.loaders.cached.Loader')
+
+    def render(self, engine, name):
+        return engine.get_template(name).render(Context(
+            {'items': [1, 2], 'title': 'T', 'name': 'footer.html'}))
+
+    def test_static_includes_are_inlined(self):
+        template = self.engine.get_template('feed.html')
+        self.assertEqual(
+            [node.template_name for node in
+             template.nodelist.get_nodes_by_type(InlineIncludeNode)],
+            ['item.html', 'item.html'])
+        self.assertEqual(len(template.nodelist.get_nodes_by_type(
+            IncludeNode)), 1)
+        self.assertEqual(self.render(self.engine, 'feed.html'), '[1T][2T][-]T')
+        self.assertEqual(self.render(self.engine, 'feed.html'),
+                         self.render(self.plain, 'feed.html'))
+
+    def test_templates_with_blocks_are_not_inlined(self):
+        template = self.engine.get_template('page.html')
+        self.assertFalse(template.nodelist.get_nodes_by_type(
+            InlineIncludeNode))
+        self.assertEqual(self.render(self.engine, 'page.html'), '<T>')
+
+    def test_cycle_state_is_per_include(self):
+        template = self.engine.get_template('cycle.html')
+        self.assertEqual(len(template.nodelist.get_nodes_by_type(
+            InlineIncludeNode)), 2)
+        self.assertEqual(self.render(self.engine, 'cycle.html'), 'a,a,a')
+        self.assertEqual(self.render(self.engine, 'cycle.html'),
+                         self.render(self.plain, 'cycle.html'))
+
+
+@override_settings(TEMPLATES=import_production().TEMPLATES)
+class ProductionTemplatesTest(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='John')
+        group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(text='Тестовый текст', author=author,
+                                        group=group)
+        Comment.objects.create(post=self.post, author=author,
+                               text='Комментарий')
+        self.urls = [
+            reverse('index'),
+            reverse('group', args=(group.slug,)),
+            reverse('profile', args=(author.username,)),
+            reverse('post', args=(author.username, self.post.pk)),
+        ]
+
+    def get_pages(self):
+        cache.clear()
+        return [Client().get(url).content for url in self.urls]
+
+    def test_pages_are_rendered_as_without_cache(self):
+        self.assertGreater(warm_up(), len(TEMPLATES))
+        production = self.get_pages()
+        with override_settings(TEMPLATES=development.TEMPLATES):
+            self.assertEqual(production, self.get_pages())
@@ -0,0 +1,20 @@
+import os
+import sys
+from importlib import import_module
+from unittest import mock
+
+PRODUCTION = 'yatube.settings.production'
+
+
+def import_production(secret_key='test-secret-key'):
+    """Заново импортирует профиль production с DJANGO_SECRET_KEY, равным
+    secret_key; при secret_key=None переменная не задана.
+    """
+    environ = {name: value for name, value in os.environ.items()
+               if name != 'DJANGO_SECRET_KEY'}
+    if secret_key is not None:
+        environ['DJANGO_SECRET_KEY'] = secret_key
+    with mock.patch.dict(os.environ, environ, clear=True), \
+            mock.patch.dict(sys.modules):
+        sys.modules.pop(PRODUCTION, None)
+        return import_module(PRODUCTION)
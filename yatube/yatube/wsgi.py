@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Шаблоны компилируются до первого запроса (только если они кэшируются,
+# как в профиле production)
+from yatube.template_loader import warm_up  # noqa: E402
+
+warm_up()